@@ -1,24 +1,44 @@
 from .scheduling_agent import SchedulingAgent, Intent
 from .prompts import (
     SYSTEM_PROMPT,
+    SYSTEM_PROMPT_STATIC,
+    CLINIC_FACTS,
+    SYSTEM_PROMPT_COMPACT,
+    SYSTEM_PROMPT_HASH,
+    system_prompt_blocks,
     GREETING_PROMPT,
+    GREETINGS,
+    greeting,
+    CANNED_RESPONSES,
     SLOT_RECOMMENDATION_PROMPT,
     BOOKING_CONFIRMATION_PROMPT,
     NO_AVAILABILITY_PROMPT,
     FAQ_RESPONSE_PROMPT,
     COLLECT_INFO_PROMPT,
     INTENT_CLASSIFICATION_PROMPT,
+    truncate_to_tokens,
+    render_slot_recommendation,
 )
 
 __all__ = [
     "SchedulingAgent",
     "Intent",
     "SYSTEM_PROMPT",
+    "SYSTEM_PROMPT_STATIC",
+    "CLINIC_FACTS",
+    "SYSTEM_PROMPT_COMPACT",
+    "SYSTEM_PROMPT_HASH",
+    "system_prompt_blocks",
     "GREETING_PROMPT",
+    "GREETINGS",
+    "greeting",
+    "CANNED_RESPONSES",
     "SLOT_RECOMMENDATION_PROMPT",
     "BOOKING_CONFIRMATION_PROMPT",
     "NO_AVAILABILITY_PROMPT",
     "FAQ_RESPONSE_PROMPT",
     "COLLECT_INFO_PROMPT",
     "INTENT_CLASSIFICATION_PROMPT",
+    "truncate_to_tokens",
+    "render_slot_recommendation",
 ]
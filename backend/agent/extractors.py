@@ -0,0 +1,139 @@
+"""
+Deterministic entity extraction for patient contact details.
+Regex-based, so information-collection turns don't need the LLM to pull out fields.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+
+# Matches may only start at the beginning of a token, so a long run of word
+# characters isn't rescanned from every position; phone numbers are bounded
+# in length, can't end inside a longer digit run and can't be an ISO date
+EMAIL_RE = re.compile(r'(?<![\w.-])[\w.-]+@[\w.-]+\.\w+')
+PHONE_RE = re.compile(r'(?<![\w+(])(?!\d{4}-\d{2}-\d{2}(?!\d))\+?\(?\d[\d\s().-]{7,18}\d(?!\d)')
+# Digits a phone number must have once separators are removed
+PHONE_DIGITS = range(10, 16)
+# Email and phone in one alternation so a message is scanned once for both;
+# email is tried first so digits inside an address aren't read as a phone
+CONTACT_RE = re.compile(f"(?P<email>{EMAIL_RE.pattern})|(?P<phone>{PHONE_RE.pattern})")
+NAME_INTRO_RE = re.compile(
+    r"\b(?:my name is|name is|this is|i am|i'm)\s+([a-z][a-z'\-]*(?:\s+[a-z][a-z'\-]*){0,3})",
+    re.IGNORECASE
+)
+_WORD_RE = re.compile(r"[a-z][a-z'\-]*", re.IGNORECASE)
+_NAME_ONLY_RE = re.compile(r"[\sa-z'\-,.;:]*", re.IGNORECASE)
+
+# Words that show the leftover text is a sentence rather than a bare name
+_NON_NAME_WORDS = frozenset({
+    "my", "is", "and", "the", "it", "it's", "its", "phone", "number", "cell",
+    "mobile", "email", "e-mail", "address", "at", "me", "you", "can", "reach",
+})
+# Words that end the name after an introduction ("my name is John and ...", "I am
+# available tomorrow"); an introduction whose first word is one of these has no name
+_NAME_STOP_WORDS = _NON_NAME_WORDS | frozenset({
+    "a", "an", "also", "available", "back", "calling", "fine", "for", "free", "from",
+    "glad", "going", "good", "great", "happy", "here", "hoping", "i", "in", "interested",
+    "just", "looking", "not", "ok", "okay", "on", "please", "ready", "really", "still",
+    "sure", "there", "to", "today", "tomorrow", "trying", "very", "wondering", "with",
+    "your",
+})
+
+
+def _is_phone(candidate: str) -> bool:
+    """Whether a PHONE_RE match has as many digits as a phone number."""
+    return sum(char.isdigit() for char in candidate) in PHONE_DIGITS
+
+
+def _contact_matches(text: str) -> List[re.Match]:
+    """Email and phone matches in the text, in order, without digit runs too short or long for a phone."""
+    return [
+        match for match in CONTACT_RE.finditer(text)
+        if match.lastgroup == "email" or _is_phone(match.group())
+    ]
+
+
+def extract_email(text: str) -> Optional[str]:
+    """Extract the first email address in the text."""
+    match = EMAIL_RE.search(text)
+    return match.group() if match else None
+
+
+def extract_phone(text: str) -> Optional[str]:
+    """Extract the first phone number in the text."""
+    for match in PHONE_RE.finditer(text):
+        if _is_phone(match.group()):
+            return match.group().strip()
+    return None
+
+
+def extract_name(text: str) -> Optional[str]:
+    """
+    Extract a patient name from the text.
+    
+    Accepts an explicit introduction ("my name is ...") or text that is only a
+    short run of words once any email and phone number are removed.
+    
+    Args:
+        text: User's message
+        
+    Returns:
+        The name, or None if the text doesn't look like one
+    """
+    return _extract_name(text, _contact_matches(text))
+
+
+def _extract_name(text: str, contact_matches: Iterable[re.Match]) -> Optional[str]:
+    """Extract a name given the email and phone matches already found in the text."""
+    # Blank out the contact details from their matches rather than rescanning; a
+    # comma in their place keeps an introduced name from running into them
+    pieces = []
+    start = 0
+    for contact in contact_matches:
+        pieces.append(text[start:contact.start()])
+        start = contact.end()
+    pieces.append(text[start:])
+    leftover = " , ".join(pieces)
+    
+    match = NAME_INTRO_RE.search(leftover)
+    if match:
+        name = []
+        for word in match.group(1).split():
+            if word.lower() in _NAME_STOP_WORDS:
+                break
+            name.append(word)
+        return " ".join(name) or None
+    
+    if not _NAME_ONLY_RE.fullmatch(leftover):
+        return None
+    
+    words = _WORD_RE.findall(leftover)
+    if not 1 <= len(words) <= 4:
+        return None
+    if any(word.lower() in _NON_NAME_WORDS for word in words):
+        return None
+    return " ".join(words)
+
+
+def extract_contact_info(text: str) -> Dict[str, str]:
+    """
+    Extract every contact field present in a message.
+    
+    Args:
+        text: User's message
+        
+    Returns:
+        Dictionary with any of "name", "phone" and "email" that were found
+    """
+    # One scan finds both emails and phones; the matches are reused for the name
+    contact_matches = _contact_matches(text)
+    fields = {}
+    for match in contact_matches:
+        kind = match.lastgroup
+        if kind not in fields:
+            fields[kind] = match.group().strip()
+    
+    name = _extract_name(text, contact_matches)
+    if name:
+        fields["name"] = name
+    return fields
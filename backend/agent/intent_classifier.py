@@ -0,0 +1,111 @@
+"""
+Local embedding-based intent classifier.
+Used when the keyword rules in SchedulingAgent.classify_intent cannot place a message,
+so unclear messages are routed without an LLM round trip.
+"""
+
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from rag.semantic_cache import normalize_embedding
+
+
+logger = logging.getLogger(__name__)
+
+
+# Example utterances per intent; PROVIDE_INFO and SELECT_SLOT are left to the
+# rules because they depend on entities and conversation phase, and CONFIRM and
+# DECLINE because a near miss on noise could book or drop an appointment
+INTENT_EXAMPLES: Dict[str, List[str]] = {
+    "SCHEDULE": [
+        "I'd like to come in and see someone",
+        "Can I get in to see the doctor this week",
+        "I need a checkup",
+        "My kid needs to be seen",
+    ],
+    "FAQ": [
+        "What insurance plans do you take",
+        "Where are you located",
+        "What time do you open",
+        "What should I bring to my first visit",
+    ],
+    "RESCHEDULE": [
+        "I need to move my visit to another day",
+        "Can I switch my appointment time",
+        "I can't make it on Tuesday, can we pick another day",
+    ],
+    "CANCEL": [
+        "I won't be able to make my visit, please remove it",
+        "Please call off my booking",
+        "I want to drop my appointment",
+    ],
+    "GREETING": [
+        "Hiya there",
+        "Greetings",
+        "Good day to you",
+    ],
+}
+
+
+class EmbeddingIntentClassifier:
+    """
+    Nearest-example intent classifier over sentence embeddings.
+    """
+    
+    def __init__(
+        self,
+        embed: Callable[[List[str]], List[List[float]]],
+        examples: Optional[Dict[str, List[str]]] = None,
+        threshold: float = 0.8
+    ):
+        """
+        Initialize the classifier.
+        
+        Args:
+            embed: Function embedding a batch of texts (e.g. VectorStore.embed)
+            examples: Example utterances keyed by intent name
+            threshold: Minimum cosine similarity to accept a prediction
+        """
+        self.embed = embed
+        self.examples = examples or INTENT_EXAMPLES
+        self.threshold = threshold
+        
+        self._labels: List[str] = []
+        self._matrix: Optional[np.ndarray] = None  # Built on first use
+    
+    def _build_index(self) -> None:
+        """Embed the example utterances once."""
+        labels = []
+        texts = []
+        for intent, utterances in self.examples.items():
+            for utterance in utterances:
+                labels.append(intent)
+                texts.append(utterance)
+        self._matrix = np.vstack([normalize_embedding(e) for e in self.embed(texts)])
+        self._labels = labels
+    
+    def classify(self, message: str) -> Tuple[Optional[str], float]:
+        """
+        Classify a message by its most similar example utterance.
+        
+        Args:
+            message: User's message
+            
+        Returns:
+            Tuple of (intent name or None if below threshold, confidence)
+        """
+        try:
+            if self._matrix is None:
+                self._build_index()
+            similarities = self._matrix @ normalize_embedding(self.embed([message])[0])
+        except Exception as e:
+            logger.exception("Intent classifier error: %s", e)
+            return None, 0.0
+        
+        best = int(np.argmax(similarities))
+        confidence = float(similarities[best])
+        if confidence < self.threshold:
+            return None, confidence
+        return self._labels[best], confidence
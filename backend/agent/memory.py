@@ -0,0 +1,104 @@
+"""
+Long-term conversation memory.
+Turns trimmed from a Gemini chat history are embedded and kept per session, so the
+few relevant to a new message can be recalled instead of resending the whole history.
+"""
+
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from cachetools import TTLCache
+
+from rag.semantic_cache import normalize_embedding
+
+
+class ConversationMemory:
+    """
+    Per-session store of older turns searchable by embedding similarity.
+    """
+    
+    def __init__(
+        self,
+        embed: Callable[[List[str]], List[List[float]]],
+        max_sessions: int = 10_000,
+        ttl_seconds: float = 3600.0,
+        max_turns: int = 200
+    ):
+        """
+        Initialize the memory.
+        
+        Args:
+            embed: Function embedding a batch of texts (e.g. VectorStore.embed)
+            max_sessions: Maximum number of sessions remembered
+            ttl_seconds: Lifetime of a session's memory after its last new turn
+            max_turns: Maximum turns kept per session; the oldest are dropped first
+        """
+        self.embed = embed
+        self.max_turns = max_turns
+        # session_id -> (one normalized embedding per row, turn texts)
+        self._sessions: TTLCache = TTLCache(maxsize=max_sessions, ttl=ttl_seconds)
+    
+    def add(
+        self,
+        session_id: str,
+        turns: List[str],
+        embeddings: Optional[List[List[float]]] = None
+    ) -> None:
+        """
+        Remember turns for a session.
+        
+        Args:
+            session_id: Session the turns belong to
+            turns: Turn texts, e.g. "user: ..." or "model: ..."
+            embeddings: Precomputed embeddings of the turns; embedded here if omitted
+        """
+        if not turns:
+            return
+        if embeddings is None:
+            embeddings = self.embed(turns)
+        
+        rows = np.vstack([normalize_embedding(e) for e in embeddings])
+        matrix, texts = self._sessions.get(session_id, (None, []))
+        matrix = rows if matrix is None else np.vstack([matrix, rows])
+        texts = texts + turns
+        self._sessions[session_id] = (matrix[-self.max_turns:], texts[-self.max_turns:])
+    
+    def recall(
+        self,
+        session_id: str,
+        query_embedding: Sequence[float],
+        k: int = 3,
+        min_similarity: float = 0.3
+    ) -> List[str]:
+        """
+        Find the remembered turns most similar to a query.
+        
+        Args:
+            session_id: Session to search
+            query_embedding: Embedding of the current message
+            k: Maximum number of turns to return
+            min_similarity: Minimum cosine similarity for a turn to be returned
+            
+        Returns:
+            Matching turns in the order they were said
+        """
+        entry: Optional[Tuple[np.ndarray, List[str]]] = self._sessions.get(session_id)
+        if entry is None:
+            return []
+        
+        matrix, texts = entry
+        similarities = matrix @ normalize_embedding(query_embedding)
+        best = np.argsort(similarities)[::-1][:k]
+        return [texts[i] for i in sorted(best) if similarities[i] >= min_similarity]
+    
+    def has(self, session_id: str) -> bool:
+        """Whether anything is remembered for a session."""
+        return session_id in self._sessions
+    
+    def drop(self, session_id: str) -> None:
+        """Forget a session."""
+        self._sessions.pop(session_id, None)
+    
+    def clear(self) -> None:
+        """Forget all sessions."""
+        self._sessions.clear()
@@ -2,7 +2,23 @@
 Prompts for the Medical Appointment Scheduling Agent.
 """
 
-SYSTEM_PROMPT = """You are a friendly and professional medical appointment scheduling assistant for HealthCare Plus Clinic. Your role is to help patients:
+import hashlib
+import random
+import re
+import string
+import sys
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+
+_EXTRA_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_TRAILING_SPACES_RE = re.compile(r"[ \t]+\n")
+
+
+def _tighten(text: str) -> str:
+    """Strip trailing spaces and extra blank lines, which cost tokens on every call."""
+    return _TRAILING_SPACES_RE.sub("\n", _EXTRA_BLANK_LINES_RE.sub("\n\n", text)).strip()
+
+SYSTEM_PROMPT_STATIC = _tighten("""You are a friendly and professional medical appointment scheduling assistant for HealthCare Plus Clinic. Your role is to help patients:
 
 1. Schedule new appointments
 2. Answer questions about the clinic (location, hours, insurance, policies, etc.)
@@ -62,9 +78,10 @@ SYSTEM_PROMPT = """You are a friendly and professional medical appointment sched
 ### Error Handling:
 - If no slots are available, apologize and offer alternatives
 - If there's a system issue, apologize and suggest calling the office
-- Always maintain a helpful, solution-oriented approach
+- Always maintain a helpful, solution-oriented approach""")
+
 
-## Important Information
+CLINIC_FACTS = _tighten("""## Important Information
 - Clinic Name: HealthCare Plus Clinic
 - Phone: +1-555-123-4567
 - Email: appointments@healthcareplus.com
@@ -72,27 +89,118 @@ SYSTEM_PROMPT = """You are a friendly and professional medical appointment sched
 - Hours: Mon-Thu 8AM-6PM, Fri 8AM-5PM, Sat 9AM-1PM, Closed Sunday
 - Cancellation Policy: 24 hours notice required, $50 no-show fee
 
-Remember: You're representing a healthcare facility. Be professional, accurate, and caring."""
+Remember: You're representing a healthcare facility. Be professional, accurate, and caring.""")
+
+
+# Terse variant for A/B testing (COMPACT_SYSTEM_PROMPT=true), with the clinic
+# facts condensed to one line
+SYSTEM_PROMPT_COMPACT = _tighten("""You are the appointment scheduling assistant for HealthCare Plus Clinic. Be warm, professional, concise; patients may be stressed.
+
+Tasks: schedule appts, answer clinic questions, reschedule/cancel, explain visit prep.
+
+Scheduling:
+1. Get reason for visit, pick appt type: Consult=30m (new symptoms, general), F/U=15m (results, meds), Physical=45m (annual), Specialist=60m (complex).
+2. Ask preferred date + morning/afternoon.
+3. Offer 3-5 matching slots, e.g. "Tuesday, December 3rd at 2:00 PM"; offer closest alternatives if none.
+4. Collect full name, phone, email; confirm reason.
+5. After booking give confirmation code, date/time, what to bring, 24h cancellation reminder.
+
+FAQ: answer, then return to scheduling if mid-booking.
+Reschedule/cancel: ask for booking ID/confirmation code, verify details, remind of 24h policy.
+Ambiguous date/time/type: ask, never assume.
+No slots: apologize, offer alternatives. System issue: apologize, suggest calling the office.
+Clinic: phone +1-555-123-4567, appointments@healthcareplus.com; 123 Medical Center Drive, Suite 200, Springfield, IL 62701; Mon-Thu 8AM-6PM, Fri 8AM-5PM, Sat 9AM-1PM, closed Sun; 24h cancellation notice, $50 no-show fee.""")
+
+
+# Static guidelines first, editable clinic facts last, so edits to the facts
+# never invalidate the cached prefix
+SYSTEM_PROMPT = sys.intern(f"{SYSTEM_PROMPT_STATIC}\n\n{CLINIC_FACTS}")
+
+# Stable key for anything cached against the current system prompt
+SYSTEM_PROMPT_HASH = hashlib.sha256(SYSTEM_PROMPT.encode()).hexdigest()
+
+# Providers that need an explicit cache_control marker to cache the prompt prefix
+CACHE_CONTROL_PROVIDERS = ("anthropic", "bedrock")
+
+
+def system_prompt_blocks(provider: str, compact: bool = False) -> Union[str, List[Dict]]:
+    """
+    Get the system prompt in the shape expected by an LLM provider.
+    
+    Args:
+        provider: LLM provider name (gemini, openai, anthropic, bedrock)
+        compact: Use SYSTEM_PROMPT_COMPACT instead of the full prompt
+        
+    Returns:
+        A list of cache-ready content blocks for providers with explicit prompt
+        caching, otherwise the plain prompt string (cached automatically)
+    """
+    cache_control = provider.lower() in CACHE_CONTROL_PROVIDERS
+    
+    if compact:
+        if cache_control:
+            return [{
+                "type": "text",
+                "text": SYSTEM_PROMPT_COMPACT,
+                "cache_control": {"type": "ephemeral"}
+            }]
+        return SYSTEM_PROMPT_COMPACT
+    
+    if cache_control:
+        return [
+            {
+                "type": "text",
+                "text": SYSTEM_PROMPT_STATIC,
+                "cache_control": {"type": "ephemeral"}
+            },
+            {"type": "text", "text": CLINIC_FACTS},
+        ]
+    return SYSTEM_PROMPT
+
+
+GREETING_PROMPT = _tighten("""Generate a warm, professional greeting for a patient who just started a conversation. 
+Keep it brief (1-2 sentences) and ask how you can help them today.
+Don't be overly enthusiastic - maintain healthcare professionalism.""")
 
+# Pre-written greetings served without an LLM call; GREETING_PROMPT is kept for
+# regenerating this table offline
+GREETINGS = (
+    "Hello, thank you for contacting HealthCare Plus Clinic. How can I help you today?",
+    "Hi! This is HealthCare Plus Clinic. I can help you schedule an appointment or answer questions about the clinic. What can I do for you?",
+    "Welcome to HealthCare Plus Clinic. Are you looking to book an appointment, or do you have a question I can help with?",
+    "Good to hear from you! I'm the HealthCare Plus Clinic scheduling assistant. How can I help you today?",
+    "Hello and welcome to HealthCare Plus Clinic. I can book appointments and answer questions about our hours, location, and insurance. What do you need today?",
+    "Hi there, thanks for reaching out to HealthCare Plus Clinic. How may I help you today?",
+)
 
-GREETING_PROMPT = """Generate a warm, professional greeting for a patient who just started a conversation. 
-Keep it brief (1-2 sentences) and ask how you can help them today.
-Don't be overly enthusiastic - maintain healthcare professionalism."""
 
+def greeting() -> str:
+    """Return one of the pre-written greetings."""
+    return random.choice(GREETINGS)
 
-SLOT_RECOMMENDATION_PROMPT = """You have the following available appointment slots:
 
-{available_slots}
+# Fixed replies for turns whose content never depends on the conversation,
+# keyed by intent name
+CANNED_RESPONSES = {
+    "CANCEL": (
+        "I'm sorry to hear you need to cancel. To find your appointment, could you share your "
+        "booking ID or confirmation code? You'll find it in your confirmation email."
+    ),
+    "RESCHEDULE": (
+        "I can help you find a new time. Could you share your booking ID or confirmation code "
+        "from your confirmation email? Once I have it, we can look at other openings."
+    ),
+    "DECLINE": "No problem. Is there anything else I can help you with today?",
+}
 
-The patient's preferences are:
-- Appointment type: {appointment_type} ({duration} minutes)
-- Preferred date: {preferred_date}
-- Time preference: {time_preference}
 
-Generate a natural response presenting 3-5 of the best matching slots. Format the times clearly and explain why you're suggesting these options if relevant. Ask which works best for them."""
+# Slots are picked and formatted in Python; the LLM only phrases the reply
+SLOT_RECOMMENDATION_PROMPT = _tighten("""Available slots for {date} ({time_preference} preference). Here are {k} options: {formatted_slots}.
 
+Present them conversationally and ask which works best.""")
 
-BOOKING_CONFIRMATION_PROMPT = """The patient has selected this appointment:
+
+BOOKING_CONFIRMATION_PROMPT = _tighten("""The patient has selected this appointment:
 - Date: {date}
 - Time: {time}
 - Type: {appointment_type}
@@ -102,10 +210,10 @@ Now you need to collect their information. Ask for their:
 2. Phone number
 3. Email address
 
-Also confirm the reason for their visit. Be conversational and efficient."""
+Also confirm the reason for their visit. Be conversational and efficient.""")
 
 
-NO_AVAILABILITY_PROMPT = """Unfortunately, there are no available appointments for the patient's requested date/time.
+NO_AVAILABILITY_PROMPT = _tighten("""Unfortunately, there are no available appointments for the patient's requested date/time.
 
 Original request:
 - Date: {preferred_date}
@@ -119,10 +227,10 @@ Generate an empathetic response that:
 1. Apologizes for the lack of availability
 2. Explains the situation briefly
 3. Offers the alternative dates/times
-4. Mentions they can call the office for urgent needs or waitlist"""
+4. Mentions they can call the office for urgent needs or waitlist""")
 
 
-FAQ_RESPONSE_PROMPT = """The patient asked a question that was answered using our knowledge base.
+FAQ_RESPONSE_PROMPT = _tighten("""The patient asked a question that was answered using our knowledge base.
 
 Question: {question}
 Retrieved Answer: {answer}
@@ -133,10 +241,10 @@ Patient's current context: {context}
 Generate a natural response that:
 1. Answers their question clearly
 2. If they were in the middle of booking, smoothly transition back
-3. Ask if they have other questions or want to continue with their original request"""
+3. Ask if they have other questions or want to continue with their original request""")
 
 
-COLLECT_INFO_PROMPT = """You're collecting patient information for booking. 
+COLLECT_INFO_PROMPT = _tighten("""You're collecting patient information for booking. 
 
 Information collected so far:
 - Name: {name}
@@ -146,10 +254,10 @@ Information collected so far:
 
 Missing information: {missing_fields}
 
-Generate a natural request for the missing information. If you have everything, confirm all the details and ask if they're ready to book."""
+Generate a natural request for the missing information. If you have everything, confirm all the details and ask if they're ready to book.""")
 
 
-INTENT_CLASSIFICATION_PROMPT = """Classify the user's intent from this message:
+INTENT_CLASSIFICATION_PROMPT = _tighten("""Classify the user's intent from this message:
 
 Message: "{message}"
 
@@ -169,18 +277,60 @@ Classify as one of:
 
 Also extract any relevant entities (dates, times, names, phone numbers, emails, appointment types).
 
-Return JSON format:
-{
-    "intent": "INTENT_TYPE",
-    "confidence": 0.95,
-    "entities": {
-        "date": "extracted date if any",
-        "time": "extracted time if any",
-        "time_preference": "morning/afternoon/evening if mentioned",
-        "name": "extracted name if any",
-        "phone": "extracted phone if any",
-        "email": "extracted email if any",
-        "appointment_type": "consultation/followup/physical/specialist if mentioned",
-        "reason": "reason for visit if mentioned"
-    }
-}"""
+Reply with the intent, a confidence between 0 and 1, and the extracted entities.""")
+
+
+# Rough token estimate for English text; avoids a tokenizer dependency
+CHARS_PER_TOKEN = 4
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cap text at an approximate token budget, cutting at a word boundary.
+    
+    Args:
+        text: Text to cap
+        max_tokens: Token budget
+        
+    Returns:
+        The text unchanged if it fits, otherwise its leading part
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    return cut[:cut.rfind(" ")] if " " in cut else cut
+
+
+def _parse_template(template: str) -> List[Tuple[str, Optional[str]]]:
+    """Split a str.format template into (literal, field name) segments."""
+    return [
+        (literal, field)
+        for literal, field, _spec, _conversion in _FORMATTER.parse(template)
+    ]
+
+
+def _join_segments(segments: List[Tuple[str, Optional[str]]], fields: Dict) -> str:
+    """Concatenate parsed template segments with their field values."""
+    parts = []
+    for literal, field in segments:
+        parts.append(literal)
+        if field is not None:
+            parts.append(str(fields[field]))
+    return "".join(parts)
+
+
+_FORMATTER = string.Formatter()
+
+
+def _compile_template(template: str) -> Callable[..., str]:
+    """Bind a renderer to a template parsed once at import instead of on every str.format call."""
+    segments = _parse_template(template)
+    
+    def render_template(**kwargs) -> str:
+        return _join_segments(segments, kwargs)
+    
+    return render_template
+
+
+render_slot_recommendation = _compile_template(SLOT_RECOMMENDATION_PROMPT)
@@ -3,33 +3,54 @@ Medical Appointment Scheduling Agent.
 Handles conversation flow, intent detection, and coordinates between tools.
 """
 
-import json
+import logging
 import uuid
 import re
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
+import warnings
+from contextvars import ContextVar
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Any, Union
 from enum import Enum
+from functools import cached_property, lru_cache
 import os
 import asyncio
 
+import ahocorasick
+from cachetools import LRUCache, TTLCache
 import google.generativeai as genai
 
 from models.schemas import (
     AppointmentType,
     APPOINTMENT_DURATIONS,
+    CONTACT_FIELDS,
     ConversationPhase,
     ConversationState,
-    ChatMessage,
 )
-from tools.availability_tool import AvailabilityTool, parse_date_reference, parse_time_preference
+from tools.availability_tool import (
+    TIME_PREFERENCE_KEYWORDS,
+    AvailabilityTool,
+    parse_date_reference,
+    parse_time_preference,
+)
 from tools.booking_tool import BookingTool
-from rag.faq_rag import get_faq_rag
+from rag.faq_rag import FAQRAG, get_faq_rag, is_faq_question
+from rag.semantic_cache import SemanticCache
+from .extractors import NAME_INTRO_RE, extract_contact_info
+from .intent_classifier import EmbeddingIntentClassifier
+from .memory import ConversationMemory
+from .session_store import RedisSessionStore
 from .prompts import (
-    SYSTEM_PROMPT,
-    INTENT_CLASSIFICATION_PROMPT,
+    CANNED_RESPONSES,
+    greeting,
+    system_prompt_blocks,
+    render_slot_recommendation,
+    truncate_to_tokens,
 )
 
 
+logger = logging.getLogger(__name__)
+
+
 class Intent(str, Enum):
     """User intent types."""
     SCHEDULE = "SCHEDULE"
@@ -44,6 +65,378 @@ class Intent(str, Enum):
     OTHER = "OTHER"
 
 
+# Intent rules, compiled once at import rather than on every message
+_GREETING_RE = re.compile(r"(?:hi|hello|hey|good morning|good afternoon|good evening)")
+# Times such as "10:30", "10:30 am" or "3pm" in one pass; "H:MM" is tried before "Ham"
+_TIME_RE = re.compile(
+    r"(?P<h1>\d{1,2}):(?P<m1>\d{2})\s*(?P<ap1>am|pm)?|(?P<h2>\d{1,2})\s*(?P<ap2>am|pm)"
+)
+_CONFIRM_RE = re.compile(
+    r"(?:yes|yea|yeah|yep|yup|confirm|book it|sounds good|perfect|great|let's do it|"
+    r"that works|ok|okay|sure|right|correct|this is right)(?:\Z|[ ,])"
+)
+
+# Substring keyword classes, one bit each
+_AVAILABILITY = 1 << 0
+_SCHEDULE = 1 << 1
+_SYMPTOM = 1 << 2
+_DECLINE = 1 << 3
+_DAY = 1 << 4
+_CANCEL = 1 << 5
+_CANCEL_TARGET = 1 << 6
+_RESCHEDULE = 1 << 7
+_CHANGE = 1 << 8
+_MY = 1 << 9
+_APPOINTMENT = 1 << 10
+_REASON = 1 << 11
+_FOLLOW_UP_REASON = 1 << 12
+_PHYSICAL_REASON = 1 << 13
+_SPECIALIST_REASON = 1 << 14
+
+_KEYWORD_CLASSES = {
+    _AVAILABILITY: ["earliest", "available", "slots", "what times", "when can"],
+    _SCHEDULE: ["schedule", "book", "appointment", "see the doctor", "need to see", "want to see"],
+    _SYMPTOM: [
+        "pain", "headache", "migraine", "fever", "sick", "hurt", "ache",
+        "sore", "cough", "cold", "flu", "nausea", "dizzy", "tired",
+        "stomach", "throat", "symptoms",
+    ],
+    # Multi-word phrases only; single decline words are matched as whole tokens
+    _DECLINE: ["won't work", "none of these", "something else"],
+    _DAY: [
+        "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+        "tomorrow", "today",
+    ],
+    _CANCEL: ["cancel"],
+    _CANCEL_TARGET: ["cancel my", "cancel the"],
+    _RESCHEDULE: ["reschedule"],
+    _CHANGE: ["change"],
+    _MY: ["my"],
+    _APPOINTMENT: ["appointment"],
+    # A reason for visit is mentioned
+    _REASON: [
+        "headache", "checkup", "check-up", "check up", "physical",
+        "follow up", "follow-up", "sick", "pain", "symptoms",
+    ],
+    # Appointment type suggested by a reason for visit
+    _FOLLOW_UP_REASON: ["follow up", "follow-up", "followup", "results", "medication"],
+    _PHYSICAL_REASON: ["physical", "annual", "checkup", "check-up", "check up"],
+    _SPECIALIST_REASON: ["specialist", "complex", "detailed"],
+}
+
+
+def _build_keyword_automaton() -> ahocorasick.Automaton:
+    """Build one Aho-Corasick automaton whose values are keyword-class bitmasks."""
+    masks: Dict[str, int] = {}
+    for bit, keywords in _KEYWORD_CLASSES.items():
+        for keyword in keywords:
+            masks[keyword] = masks.get(keyword, 0) | bit
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, mask in masks.items():
+        automaton.add_word(keyword, mask)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+# Single-word decline cues, matched against whole tokens so e.g. "now" or
+# "know" don't read as "no"
+_DECLINE_WORDS = frozenset({"no", "nope", "don't", "different", "other"})
+_TOKEN_RE = re.compile(r"[a-z']+")
+
+# Slot selection days, whole words only; weekdays may be abbreviated ("tue", "fri")
+_DAY_NAME_RE = re.compile(
+    r"\b(today|tomorrow|mon(?:day)?|tue(?:sday)?|wed(?:nesday)?|thu(?:rsday)?|"
+    r"fri(?:day)?|sat(?:urday)?|sun(?:day)?)\b"
+)
+# Something parse_date_reference or parse_time_preference could match; a message
+# without any of these can't hold a date or time preference
+_DATE_HINT_RE = re.compile(
+    "|".join([
+        r"\d", "mon", "tue", "wed", "thu", "fri", "sat", "sun", "today", "tomorrow", "week",
+        *(re.escape(keyword) for _preference, keywords in TIME_PREFERENCE_KEYWORDS for keyword in keywords),
+    ]),
+    re.IGNORECASE
+)
+# Three-letter day abbreviation -> datetime.weekday() index
+_WEEKDAY_INDEX = {
+    name: index
+    for index, name in enumerate(("mon", "tue", "wed", "thu", "fri", "sat", "sun"))
+}
+
+
+def _keyword_hits(text: str) -> int:
+    """Scan text once and return the bitmask of keyword classes found in it."""
+    hits = 0
+    for _end, mask in _KEYWORD_AUTOMATON.iter(text):
+        hits |= mask
+    return hits
+
+
+# Precedence when a reason mentions keywords for several types
+_APPOINTMENT_TYPE_PRIORITY = (
+    (_FOLLOW_UP_REASON, AppointmentType.FOLLOW_UP),
+    (_PHYSICAL_REASON, AppointmentType.PHYSICAL_EXAM),
+    (_SPECIALIST_REASON, AppointmentType.SPECIALIST_CONSULTATION),
+)
+_APPOINTMENT_TYPE_SUGGESTIONS = {
+    AppointmentType.FOLLOW_UP: "Follow-up (15 minutes)",
+    AppointmentType.PHYSICAL_EXAM: "Physical Exam (45 minutes)",
+    AppointmentType.SPECIALIST_CONSULTATION: "Specialist Consultation (60 minutes)",
+    AppointmentType.GENERAL_CONSULTATION: "General Consultation (30 minutes)",
+}
+
+
+def _infer_appointment_type(reason: str) -> AppointmentType:
+    """Pick the appointment type suggested by a reason for visit in one automaton pass."""
+    hits = _keyword_hits(reason.lower())
+    for bit, appointment_type in _APPOINTMENT_TYPE_PRIORITY:
+        if hits & bit:
+            return appointment_type
+    return AppointmentType.GENERAL_CONSULTATION
+
+
+def _next_weekday(weekday: int, today: Optional[date] = None) -> str:
+    """Date (YYYY-MM-DD) of the next given weekday, a week out if it is today."""
+    today = today or datetime.now().date()
+    days_until = (weekday - today.weekday()) % 7 or 7
+    return (today + timedelta(days=days_until)).isoformat()
+
+
+def _time_preference_or_none(message: str) -> Optional[str]:
+    """Time-of-day preference in a message, or None when it names none."""
+    time_pref = parse_time_preference(message)
+    return None if time_pref == "any" else time_pref
+
+
+async def _failure_as_result(request: Awaitable[Dict], label: str) -> Dict:
+    """Await a tool request, turning an exception into an unsuccessful result."""
+    try:
+        return await request
+    except Exception as e:
+        logger.warning("%s error: %s", label, e, exc_info=True)
+        return {"success": False, "error": str(e)}
+
+
+async def _response_text(response: Any, queue: Optional[asyncio.Queue]) -> str:
+    """Get a Gemini response's text, forwarding each chunk to the queue if one is given."""
+    if queue is None:
+        return response.text
+    chunks = []
+    async for chunk in response:
+        chunks.append(chunk.text)
+        queue.put_nowait(chunk.text)
+    return "".join(chunks)
+
+
+def _normalize_time(hour: str, minute: str, ampm: Optional[str]) -> str:
+    """Normalize time to 24-hour format; ampm is "am", "pm" or None, already lowercase."""
+    h = int(hour)
+    if ampm:
+        # 12 am -> 00 and 12 pm -> 12 fall out of the modulo
+        h = h % 12 + (12 if ampm == "pm" else 0)
+    return f"{h:02d}:{int(minute):02d}"
+
+
+@lru_cache(maxsize=2048)
+def _parse_slot_text(
+    message_lower: str,
+    preferred_date: Optional[str],
+    today: date
+) -> Tuple[str, Optional[str]]:
+    """
+    Parse the date and start time a user picked; memoized so repeated selections are a lookup.
+    
+    Args:
+        message_lower: Lowercased, stripped user message
+        preferred_date: Date to use when the message names no day
+        today: Current date, part of the key so relative days stay correct after midnight
+        
+    Returns:
+        Tuple of (date in YYYY-MM-DD format, HH:MM start time or None)
+    """
+    selected_date = preferred_date
+    selected_time = None
+    
+    # Extract day; tomorrow is only formatted when it is picked or needed as the default
+    match = _DAY_NAME_RE.search(message_lower)
+    if match:
+        day_name = match.group(1)
+        if day_name == "today":
+            selected_date = today.isoformat()
+        elif day_name == "tomorrow":
+            selected_date = None
+        else:
+            selected_date = _next_weekday(_WEEKDAY_INDEX[day_name[:3]], today)
+    if selected_date is None:
+        selected_date = (today + timedelta(days=1)).isoformat()
+    
+    # Extract time
+    match = _TIME_RE.search(message_lower)
+    if match:
+        if match.group("h1") is not None:
+            selected_time = _normalize_time(match.group("h1"), match.group("m1"), match.group("ap1"))
+        else:
+            selected_time = _normalize_time(match.group("h2"), "00", match.group("ap2"))
+    
+    return selected_date, selected_time
+
+
+def _format_date_long(date_str: str) -> str:
+    """Format a YYYY-MM-DD date as e.g. "Friday, October 16", returning unparseable input unchanged."""
+    try:
+        return date.fromisoformat(date_str).strftime("%A, %B %d")
+    except ValueError:
+        return date_str
+
+
+# Two-digit 24-hour "HH" -> (12-hour label, AM/PM)
+_HOUR_12H = {f"{hour:02d}": (str(hour % 12 or 12), "AM" if hour < 12 else "PM") for hour in range(24)}
+
+
+def _format_time_12h(time_str: str) -> str:
+    """Format an HH:MM time as e.g. "2:30 PM", returning unparseable input unchanged."""
+    hour, _sep, minute = time_str.partition(":")
+    label = _HOUR_12H.get(hour.zfill(2))
+    if label is None or len(minute) != 2 or not minute.isdigit() or minute > "59":
+        return time_str
+    return f"{label[0]}:{minute} {label[1]}"
+
+
+@lru_cache(maxsize=512)
+def _format_slot(date_str: str, time_str: str) -> Tuple[str, str]:
+    """
+    Format a slot's date and start time for display; memoized since a slot is
+    shown again on each turn until it is booked.
+    
+    Args:
+        date_str: Slot date in YYYY-MM-DD format, or "" if unknown
+        time_str: Slot start time in HH:MM format, or "" if unknown
+        
+    Returns:
+        Tuple of (e.g. "Friday, October 16", e.g. "2:30 PM"), with placeholder
+        wording for a missing date or time
+    """
+    formatted_date = _format_date_long(date_str) if date_str else "the selected date"
+    formatted_time = _format_time_12h(time_str) if time_str else "the selected time"
+    return formatted_date, formatted_time
+
+
+# Set as every Gemini model's default, so the SDK converts it once per model
+# rather than on each request it is passed to
+GENERATION_CONFIG = genai.types.GenerationConfig(
+    temperature=0.7,
+    max_output_tokens=500
+)
+
+# Gemini models built for system prompt overrides in generate_response, reused by prompt
+MAX_PROMPT_MODELS = 16
+
+# Session store bounds; a session expires after an hour without a new message
+MAX_SESSIONS = 10_000
+SESSION_TTL_SECONDS = 3600
+# Gemini chat history resent with each message (user/model pairs, so keep it even)
+MAX_CHAT_HISTORY_MESSAGES = 12
+# Turns trimmed from that history are kept in conversation memory, capped at this many tokens each
+MEMORY_TURN_TOKENS = 128
+
+# Fewest words a message needs before the embedding classifier is tried
+MIN_CLASSIFIER_WORDS = 3
+# Intents only the keyword rules may return; see classify_intent
+_RULE_ONLY_INTENTS = frozenset({Intent.CONFIRM.value, Intent.DECLINE.value})
+
+# Wildcard phase in SchedulingAgent's transition table
+ANY_PHASE = None
+
+# Phase groups tested on every message, as frozensets of the enum members
+_TIME_SELECTION_PHASES = frozenset({
+    ConversationPhase.SLOT_RECOMMENDATION,
+    ConversationPhase.COLLECTING_PREFERENCES,
+})
+_CONTACT_INFO_PHASES = frozenset({
+    ConversationPhase.COLLECTING_INFO,
+    ConversationPhase.CONFIRMATION,
+})
+# Phases in which an FAQ interrupts scheduling that should resume afterwards
+_SCHEDULING_PHASES = frozenset({
+    ConversationPhase.UNDERSTANDING_NEEDS,
+    ConversationPhase.COLLECTING_PREFERENCES,
+    ConversationPhase.SLOT_RECOMMENDATION,
+    ConversationPhase.COLLECTING_INFO,
+})
+
+# Gemini instructions when the user declines, per phase; other phases get a canned reply
+_DECLINE_CONTEXTS = {
+    ConversationPhase.SLOT_RECOMMENDATION: (
+        "The user declined the offered time slots. Offer to check different dates "
+        "or ask if they have a specific day/time preference. Be understanding and helpful."
+    ),
+    ConversationPhase.CONFIRMATION: (
+        "The user doesn't want to confirm the appointment as is. "
+        "Ask if they'd like to change any details or start over with a different time. "
+        "Be accommodating."
+    ),
+}
+
+# Gemini instructions that hold nothing about the patient, by id; replies to them are
+# generated without session history and reused for the same id and message (see
+# SchedulingAgent.chat_with_gemini)
+_STATIC_CONTEXTS = {
+    "ask_date_preference": (
+        "The user has confirmed their appointment type. Now ask about their preferred date and time. "
+        "Ask if they prefer morning or afternoon, and if they have a specific date in mind or want earliest availability. "
+        "Keep it conversational and friendly."
+    ),
+    "confirm_without_slot": (
+        "The user wants to confirm but hasn't selected a specific time slot yet. "
+        "Ask them which of the available times works best for them."
+    ),
+    "confirm_unclear": "The user said something affirmative. Ask what they'd like to confirm or help with.",
+}
+# Context for messages no rule or classifier could place. The messages are free-form
+# and may carry personal details, so replies to them are never cached or shared
+_UNKNOWN_MENU_CONTEXT = (
+    "The user's intent wasn't clear. Politely explain that you can help with:\n"
+    "- Scheduling new appointments\n"
+    "- Answering questions about the clinic (insurance, hours, location, etc.)\n"
+    "- Rescheduling or canceling existing appointments\n\n"
+    "Ask how you can assist them. Keep it friendly and brief."
+)
+# Bounds of the exact-match cache of replies to static contexts
+STATIC_RESPONSE_CACHE_SIZE = 512
+STATIC_RESPONSE_TTL_SECONDS = 3600
+
+# Minimum cosine similarity for reusing a cached LLM response, per intent. Responses
+# are shared across sessions, so only FAQ answers given before anything is known
+# about the patient are cached, never replies to free-form patient text
+RESPONSE_CACHE_THRESHOLDS = {
+    Intent.FAQ.value: 0.95,
+}
+DEFAULT_RESPONSE_CACHE_THRESHOLD = 0.98
+# FAQ answers given before anything is known about the patient, shared by every session
+STANDALONE_FAQ_CACHE_BUCKET = (Intent.FAQ.value, "standalone")
+# Queue receiving Gemini text chunks while a streamed reply is being generated
+_token_stream: ContextVar[Optional[asyncio.Queue]] = ContextVar("token_stream", default=None)
+# Stands in for the Calendly link in a reply drafted before the link is known
+BOOKING_LINK_PLACEHOLDER = "[BOOKING_LINK]"
+# Context for drafting the reply to a booking the user finishes through a Calendly link
+_BOOKING_LINK_CONTEXT_TEMPLATE = (
+    "The appointment details have been prepared! However, to complete the booking "
+    "and receive a confirmation email, the user needs to click this Calendly link:\n\n"
+    f"🔗 {BOOKING_LINK_PLACEHOLDER}\n\n"
+    "Details prepared:\n"
+    "- Date: {date}\n"
+    "- Time: {time}\n"
+    "- Name: {name}\n"
+    "- Email: {email}\n\n"
+    "Explain that they need to click the link to finalize the booking. "
+    "Calendly will send them a confirmation email with all the details. "
+    f"Be warm and helpful. Include the link exactly as {BOOKING_LINK_PLACEHOLDER} in your response."
+)
+
+
 class SchedulingAgent:
     """
     Intelligent conversational agent for medical appointment scheduling.
@@ -59,43 +452,188 @@ class SchedulingAgent:
         self.api_base_url = api_base_url
         self.availability_tool = AvailabilityTool(api_base_url)
         self.booking_tool = BookingTool(api_base_url)
-        self.faq_rag = get_faq_rag()
         
-        # Initialize Gemini client
-        api_key = os.getenv("GOOGLE_API_KEY")
+        # Gemini settings; the model itself is created on first use
         self.model_name = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+        compact_prompt = os.getenv("COMPACT_SYSTEM_PROMPT", "false").lower() == "true"
+        # Gemini only takes a plain string (and caches the prefix itself); the content
+        # block form is for provider clients with explicit prompt caching
+        self.system_prompt = system_prompt_blocks("gemini", compact=compact_prompt)
+        self._prompt_models: LRUCache = LRUCache(maxsize=MAX_PROMPT_MODELS)
+        
+        # Chat sessions for each user session, expired alongside the sessions below
+        self.chat_sessions: TTLCache = TTLCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS)
+        
+        # Responses to near-duplicate messages, bucketed by (intent, phase) so
+        # e.g. a FAQ answer is never reused for a scheduling turn
+        self.response_caches: Dict[Tuple[str, str], SemanticCache] = {}
+        # Replies to static contexts, keyed by (context id, normalized message);
+        # checked before the semantic caches since it needs no embedding
+        self.static_responses: TTLCache = TTLCache(
+            maxsize=STATIC_RESPONSE_CACHE_SIZE,
+            ttl=STATIC_RESPONSE_TTL_SECONDS
+        )
         
-        if api_key:
-            genai.configure(api_key=api_key)
-            self.llm_model = genai.GenerativeModel(
-                model_name=self.model_name,
-                system_instruction=SYSTEM_PROMPT
-            )
-            # Chat sessions for each user session
-            self.chat_sessions: Dict[str, Any] = {}
-        else:
-            self.llm_model = None
-            self.chat_sessions = {}
+        # Phase transitions: (intent, phase) -> handler, each called as
+        # handler(entities, message, state). ANY_PHASE entries apply when no
+        # phase-specific entry exists; anything unlisted goes to _handle_unknown.
+        self._intent_handlers: Dict[
+            Tuple[Intent, Optional[ConversationPhase]],
+            Callable[[Dict, str, ConversationState], Awaitable[str]]
+        ] = {
+            (Intent.GREETING, ANY_PHASE): lambda entities, message, state: self._handle_greeting(state),
+            (Intent.FAQ, ANY_PHASE): lambda entities, message, state: self._handle_faq(message, state),
+            (Intent.SCHEDULE, ANY_PHASE): self._handle_schedule_request,
+            (Intent.SELECT_SLOT, ANY_PHASE): self._handle_slot_selection,
+            (Intent.PROVIDE_INFO, ConversationPhase.COLLECTING_INFO): self._handle_info_provided,
+            (Intent.CONFIRM, ConversationPhase.COLLECTING_PREFERENCES):
+                lambda entities, message, state: self._confirm_preferences(state),
+            (Intent.CONFIRM, ConversationPhase.SLOT_RECOMMENDATION):
+                lambda entities, message, state: self._confirm_slot(state),
+            (Intent.CONFIRM, ConversationPhase.COLLECTING_INFO):
+                lambda entities, message, state: self._confirm_contact_info(state),
+            (Intent.CONFIRM, ConversationPhase.CONFIRMATION):
+                lambda entities, message, state: self._handle_confirmation(state),
+            (Intent.CONFIRM, ANY_PHASE): lambda entities, message, state: self._confirm_unclear(state),
+            (Intent.DECLINE, ANY_PHASE): lambda entities, message, state: self._handle_decline(state),
+            (Intent.CANCEL, ANY_PHASE): lambda entities, message, state: self._handle_cancel_request(message, state),
+            (Intent.RESCHEDULE, ANY_PHASE):
+                lambda entities, message, state: self._handle_reschedule_request(message, state),
+        }
         
-        # Session storage (in production, use Redis or database)
-        self.sessions: Dict[str, ConversationState] = {}
+        # Session storage, bounded so idle sessions don't accumulate forever
+        self.sessions: TTLCache = TTLCache(maxsize=MAX_SESSIONS, ttl=SESSION_TTL_SECONDS)
+        # With REDIS_URL set, sessions are shared through Redis so any worker can
+        # continue a conversation; the cache above then holds this worker's copies
+        redis_url = os.getenv("REDIS_URL")
+        self.session_store: Optional[RedisSessionStore] = (
+            RedisSessionStore(redis_url, ttl_seconds=SESSION_TTL_SECONDS) if redis_url else None
+        )
+    
+    @cached_property
+    def faq_rag(self) -> FAQRAG:
+        """FAQ RAG system, loaded on first use."""
+        return get_faq_rag()
+    
+    @cached_property
+    def intent_classifier(self) -> EmbeddingIntentClassifier:
+        """Fallback intent classifier, built on first use."""
+        return EmbeddingIntentClassifier(self.faq_rag.vector_store.embed)
+    
+    @cached_property
+    def conversation_memory(self) -> Optional[ConversationMemory]:
+        """Memory of turns trimmed from chat history; None unless CONVERSATION_MEMORY is enabled."""
+        if os.getenv("CONVERSATION_MEMORY", "false").lower() != "true":
+            return None
+        return ConversationMemory(
+            self.faq_rag.vector_store.embed,
+            max_sessions=MAX_SESSIONS,
+            ttl_seconds=SESSION_TTL_SECONDS
+        )
+    
+    @cached_property
+    def llm_model(self) -> Optional[genai.GenerativeModel]:
+        """Gemini model, created on first use; None when GOOGLE_API_KEY is unset."""
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            return None
+        
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(
+            model_name=self.model_name,
+            system_instruction=self.system_prompt,
+            generation_config=GENERATION_CONFIG
+        )
     
     def get_or_create_session(self, session_id: Optional[str] = None) -> ConversationState:
         """Get existing session or create a new one."""
-        if session_id and session_id in self.sessions:
-            return self.sessions[session_id]
+        state = self.sessions.get(session_id) if session_id else None
+        if state is not None:
+            return state
         
         new_session_id = session_id or str(uuid.uuid4())
         state = ConversationState(session_id=new_session_id)
         self.sessions[new_session_id] = state
         return state
     
-    def update_session(self, state: ConversationState) -> None:
-        """Update session state."""
-        state.updated_at = datetime.now()
+    def update_session(self, state: ConversationState, now: Optional[datetime] = None) -> None:
+        """Update session state, stamping it with the given time (default: now)."""
+        state.updated_at = now or datetime.now()
         self.sessions[state.session_id] = state
     
-    async def classify_intent(self, message: str, current_phase: str) -> Tuple[Intent, Dict]:
+    async def load_session(self, session_id: Optional[str]) -> Optional[ConversationState]:
+        """
+        Look up a session, reading the shared store first when one is configured.
+        
+        Args:
+            session_id: Session to look up
+            
+        Returns:
+            The session's state, or None if it doesn't exist
+        """
+        if not session_id:
+            return None
+        if self.session_store is not None:
+            try:
+                state = await self.session_store.get(session_id)
+            except Exception as e:
+                # Keep serving this worker's copy while the store is unreachable
+                logger.warning("Session store error: %s", e, exc_info=True)
+            else:
+                # The store is authoritative: another worker may have moved the
+                # conversation on, or deleted it
+                if state is None:
+                    self.sessions.pop(session_id, None)
+                else:
+                    self.sessions[session_id] = state
+                return state
+        return self.sessions.get(session_id)
+    
+    async def save_session(self, state: ConversationState, now: Optional[datetime] = None) -> None:
+        """Update a session and write it to the shared store when one is configured."""
+        self.update_session(state, now)
+        if self.session_store is not None:
+            try:
+                await self.session_store.put(state)
+            except Exception as e:
+                logger.warning("Session store error: %s", e, exc_info=True)
+    
+    async def delete_session(self, session_id: str) -> bool:
+        """
+        Forget a session everywhere it is kept.
+        
+        Args:
+            session_id: Session to delete
+            
+        Returns:
+            Whether the session existed
+        """
+        found = self.sessions.pop(session_id, None) is not None
+        self.chat_sessions.pop(session_id, None)
+        if self.conversation_memory is not None:
+            self.conversation_memory.drop(session_id)
+        if self.session_store is not None:
+            found = await self.session_store.delete(session_id) or found
+        return found
+    
+    async def clear_sessions(self) -> None:
+        """Forget every session."""
+        self.sessions.clear()
+        if self.session_store is not None:
+            await self.session_store.clear()
+    
+    async def close(self) -> None:
+        """Release the tools' HTTP connections and the session store."""
+        closing = [self.availability_tool.close(), self.booking_tool.close()]
+        if self.session_store is not None:
+            closing.append(self.session_store.close())
+        await asyncio.gather(*closing)
+    
+    async def classify_intent(
+        self,
+        message: str,
+        current_phase: ConversationPhase
+    ) -> Tuple[Intent, Dict]:
         """
         Classify user intent and extract entities.
         
@@ -111,184 +649,169 @@ class SchedulingAgent:
         entities = {}
         
         # Greeting detection
-        greetings = ["hi", "hello", "hey", "good morning", "good afternoon", "good evening"]
-        if any(message_lower.startswith(g) for g in greetings) or message_lower in greetings:
+        if _GREETING_RE.match(message_lower):
             return Intent.GREETING, entities
         
         # Check for time selection (when user mentions specific times like "1:30 AM", "12:00", etc.)
         # This should be handled before other intents when we're in slot recommendation phase
-        time_pattern = r'\d{1,2}:\d{2}\s*(am|pm)?|\d{1,2}\s*(am|pm)'
-        if re.search(time_pattern, message_lower, re.IGNORECASE):
+        has_time = _TIME_RE.search(message_lower) is not None
+        if has_time:
             # User is selecting a specific time
-            if current_phase in ["slot_recommendation", "collecting_preferences"]:
+            if current_phase in _TIME_SELECTION_PHASES:
                 return Intent.SELECT_SLOT, entities
         
         # Check for "earliest" or "available slots" - user wants to see slots
-        availability_keywords = ["earliest", "available slots", "available", "slots", "what times", "when can"]
-        if any(kw in message_lower for kw in availability_keywords):
+        hits = _keyword_hits(message_lower)
+        if hits & _AVAILABILITY:
             # This means user wants to see available slots
             date = parse_date_reference(message)
             if date:
                 entities["date"] = date
-            time_pref = parse_time_preference(message)
-            if time_pref != "any":
+            time_pref = _time_preference_or_none(message)
+            if time_pref:
                 entities["time_preference"] = time_pref
             return Intent.SELECT_SLOT, entities
         
-        # FAQ detection
-        faq_keywords = [
-            "where", "location", "address", "parking", "directions",
-            "insurance", "accept", "payment", "cost", "price", "billing",
-            "hours", "open", "close", "when are you",
-            "bring", "documents", "prepare", "first visit",
-            "cancel", "cancellation policy", "policy",
-            "covid", "mask", "protocol",
-            "telehealth", "virtual"
-        ]
-        
-        # Check for FAQ intent
-        if self.faq_rag.is_faq_question(message):
+        # Check for FAQ intent; keyword-only, so the FAQ RAG isn't loaded just to route
+        if is_faq_question(message):
             # Check if it's actually a cancellation request vs cancellation policy
-            if "cancel my" in message_lower or "cancel the" in message_lower:
+            if hits & _CANCEL_TARGET:
                 return Intent.CANCEL, entities
             return Intent.FAQ, entities
         
         # Scheduling intent - explicit keywords
-        schedule_keywords = ["schedule", "book", "appointment", "see the doctor", "need to see", "want to see", "scheduling"]
-        if any(kw in message_lower for kw in schedule_keywords):
+        if hits & _SCHEDULE:
             # Extract date if present
             date = parse_date_reference(message)
             if date:
                 entities["date"] = date
             
             # Extract time preference
-            time_pref = parse_time_preference(message)
-            if time_pref != "any":
+            time_pref = _time_preference_or_none(message)
+            if time_pref:
                 entities["time_preference"] = time_pref
             
             return Intent.SCHEDULE, entities
         
         # Medical symptoms that imply scheduling need
-        symptom_keywords = ["pain", "headache", "migraine", "fever", "sick", "hurt", "ache", 
-                          "sore", "cough", "cold", "flu", "nausea", "dizzy", "tired",
-                          "chest pain", "stomach", "throat", "symptoms"]
-        if any(kw in message_lower for kw in symptom_keywords):
+        if hits & _SYMPTOM:
             # User is describing symptoms - treat as scheduling request
             entities["reason"] = message
             return Intent.SCHEDULE, entities
         
         # Cancel intent
-        if "cancel" in message_lower and ("my" in message_lower or "appointment" in message_lower):
+        if hits & _CANCEL and hits & (_MY | _APPOINTMENT):
             return Intent.CANCEL, entities
         
         # Reschedule intent
-        if "reschedule" in message_lower or "change" in message_lower and "appointment" in message_lower:
+        if hits & _RESCHEDULE or hits & _CHANGE and hits & _APPOINTMENT:
             return Intent.RESCHEDULE, entities
         
         # Confirm intent - short affirmative responses
-        confirm_words = ["yes", "yea", "yeah", "yep", "yup", "confirm", "book it", "sounds good", "perfect", "great", "let's do it", "that works", "ok", "okay", "sure", "right", "correct", "this is right"]
-        if any(message_lower == cw or message_lower.startswith(cw + " ") or message_lower.startswith(cw + ",") for cw in confirm_words):
+        if _CONFIRM_RE.match(message_lower):
             return Intent.CONFIRM, entities
         
         # Decline intent
-        decline_words = ["no", "nope", "don't", "won't work", "different", "other", "none of these", "something else"]
-        if any(dw in message_lower for dw in decline_words):
+        if hits & _DECLINE or not _DECLINE_WORDS.isdisjoint(_TOKEN_RE.findall(message_lower)):
             return Intent.DECLINE, entities
         
         # Select slot (check for time patterns)
-        time_patterns = [
-            r'\d{1,2}:\d{2}',  # 10:00
-            r'\d{1,2}\s*(am|pm)',  # 10 am
-            r'\d{1,2}:\d{2}\s*(am|pm)',  # 10:00 am
-        ]
-        for pattern in time_patterns:
-            if re.search(pattern, message_lower):
-                return Intent.SELECT_SLOT, {"time_selection": message}
+        if has_time:
+            return Intent.SELECT_SLOT, {"time_selection": message}
         
         # Check for day selection during slot recommendation
-        days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday", 
-                "tomorrow", "today"]
-        if current_phase == ConversationPhase.SLOT_RECOMMENDATION.value:
-            for day in days:
-                if day in message_lower:
-                    return Intent.SELECT_SLOT, {"date_selection": message}
-        
-        # Provide info - detect name, phone, email patterns
-        email_pattern = r'[\w\.-]+@[\w\.-]+\.\w+'
-        phone_pattern = r'[\d\-\(\)\s\+]{10,}'
-        
-        if current_phase in [ConversationPhase.COLLECTING_INFO.value, ConversationPhase.CONFIRMATION.value]:
-            if re.search(email_pattern, message):
-                entities["email"] = re.search(email_pattern, message).group()
-                return Intent.PROVIDE_INFO, entities
-            if re.search(phone_pattern, message):
-                entities["phone"] = re.search(phone_pattern, message).group()
-                return Intent.PROVIDE_INFO, entities
-            # Assume it might be a name or other info
+        if current_phase is ConversationPhase.SLOT_RECOMMENDATION and hits & _DAY:
+            return Intent.SELECT_SLOT, {"date_selection": message}
+        
+        # Provide info - extract name, phone, email deterministically
+        if current_phase in _CONTACT_INFO_PHASES:
+            entities.update(extract_contact_info(message))
             return Intent.PROVIDE_INFO, entities
         
+        # Rules didn't match - try the local embedding classifier before giving up;
+        # building it and embedding the message both run off the event loop. Short
+        # messages carry too little to embed reliably, and a guessed CONFIRM or
+        # DECLINE could act on a booking, so those are left to the rules
+        if len(message_lower.split()) >= MIN_CLASSIFIER_WORDS:
+            predicted, _confidence = await asyncio.to_thread(lambda: self.intent_classifier.classify(message))
+            if predicted and predicted not in _RULE_ONLY_INTENTS:
+                return Intent(predicted), entities
+        
         # Default
         return Intent.OTHER, entities
     
     async def generate_response(
         self,
         messages: List[Dict],
-        system_prompt: Optional[str] = None
+        system_prompt: Optional[Union[str, List[Dict]]] = None
     ) -> str:
         """
         Generate a response using the LLM.
         
+        Deprecated: converts and resends the whole conversation on every call. Use
+        chat_with_gemini, which keeps the history in the Gemini chat session and
+        only sends the new turn.
+        
         Args:
             messages: Conversation messages
-            system_prompt: Optional system prompt override
+            system_prompt: Optional system prompt override (string or content blocks)
             
         Returns:
             Generated response text
         """
+        warnings.warn(
+            "generate_response is deprecated; use chat_with_gemini",
+            DeprecationWarning,
+            stacklevel=2
+        )
         if not self.llm_model:
             # Fallback for when LLM is not available
             return self._generate_fallback_response(messages)
         
         try:
             # Convert messages to Gemini format
-            gemini_messages = []
-            for msg in messages:
-                role = "user" if msg["role"] == "user" else "model"
-                gemini_messages.append({
-                    "role": role,
-                    "parts": [msg["content"]]
-                })
+            gemini_messages = [
+                {"role": "user" if msg["role"] == "user" else "model", "parts": [msg["content"]]}
+                for msg in messages
+            ]
             
             # Create a chat session with custom system instruction if provided
-            if system_prompt and system_prompt != SYSTEM_PROMPT:
-                model = genai.GenerativeModel(
-                    model_name=self.model_name,
-                    system_instruction=system_prompt
-                )
+            if system_prompt and system_prompt != self.system_prompt:
+                model = self._model_for_prompt(system_prompt)
             else:
                 model = self.llm_model
             
-            # Use async wrapper for Gemini
-            response = await asyncio.to_thread(
-                lambda: model.generate_content(
-                    gemini_messages,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        max_output_tokens=500
-                    )
-                )
-            )
+            response = await model.generate_content_async(gemini_messages)
             
             return response.text
         except Exception as e:
-            print(f"LLM error: {e}")
+            logger.exception("LLM error: %s", e)
             return self._generate_fallback_response(messages)
     
+    def _model_for_prompt(self, system_prompt: Union[str, List[Dict]]) -> genai.GenerativeModel:
+        """Return a Gemini model with the given system instruction, building it on first use."""
+        # Gemini rejects content blocks, so they are joined back into the plain prompt
+        if not isinstance(system_prompt, str):
+            system_prompt = "\n\n".join(block["text"] for block in system_prompt)
+        model = self._prompt_models.get(system_prompt)
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=self.model_name,
+                system_instruction=system_prompt,
+                generation_config=GENERATION_CONFIG
+            )
+            self._prompt_models[system_prompt] = model
+        return model
+    
     async def chat_with_gemini(
         self,
         message: str,
         session_id: str,
-        context: Optional[str] = None
+        context: Optional[str] = None,
+        cache_bucket: Optional[Tuple[str, str]] = None,
+        message_embedding: Optional[List[float]] = None,
+        stream: bool = True,
+        context_id: Optional[str] = None
     ) -> str:
         """
         Chat with Gemini using conversation history.
@@ -297,6 +820,15 @@ class SchedulingAgent:
             message: User's message
             session_id: Session ID for conversation continuity
             context: Optional context to include (e.g., FAQ answer, availability)
+            cache_bucket: Optional (intent, phase) under which the response may be
+                reused for near-duplicate messages; only pass this when the
+                context holds nothing specific to the patient
+            message_embedding: Precomputed embedding of the message for the cache
+            stream: Whether chunks may be forwarded to a client of process_message_stream;
+                pass False for replies that are post-processed or may be discarded
+            context_id: Identifier of a static context; the reply is generated without
+                the session's history and reused whenever the same id comes with
+                the same message, without calling Gemini
             
         Returns:
             Generated response text
@@ -304,34 +836,158 @@ class SchedulingAgent:
         if not self.llm_model:
             return self._generate_fallback_response([{"role": "user", "content": message}])
         
+        static_key = None
+        if context_id is not None:
+            static_key = (context_id, " ".join(message.lower().split()))
+            cached = self.static_responses.get(static_key)
+            if cached:
+                await self._record_turn(session_id, message, cached)
+                return cached
+        
+        cache = None
+        if cache_bucket is not None:
+            try:
+                cache = self._get_response_cache(cache_bucket)
+                if message_embedding is None:
+                    message_embedding = await asyncio.to_thread(self.faq_rag.embed, message)
+                cached = cache.get(message_embedding)
+                if cached:
+                    await self._record_turn(session_id, message, cached)
+                    return cached
+            except Exception as e:
+                logger.exception("Response cache error: %s", e)
+                cache = None
+        
         try:
-            # Get or create chat session for this user
-            if session_id not in self.chat_sessions:
-                self.chat_sessions[session_id] = self.llm_model.start_chat(history=[])
-            
-            chat = self.chat_sessions[session_id]
-            
             # Include context if provided
             prompt = message
             if context:
                 prompt = f"[CONTEXT: {context}]\n\nUser message: {message}"
             
-            # Generate response
-            response = await asyncio.to_thread(
-                lambda: chat.send_message(
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        temperature=0.7,
-                        max_output_tokens=500
-                    )
-                )
-            )
+            # Generate response, forwarding chunks as they arrive when a client is streaming
+            queue = _token_stream.get() if stream else None
+            if static_key is not None:
+                # Replies to static contexts are shared by every session, so they are
+                # generated without this session's history and added to it afterwards
+                response = await self.llm_model.generate_content_async(prompt, stream=queue is not None)
+                text = await _response_text(response, queue)
+                await self._record_turn(session_id, message, text)
+                self.static_responses[static_key] = text
+                return text
+            
+            chat = self._chat_session(session_id)
+            
+            # Bring back earlier turns relevant to this message that were trimmed from history
+            recalled = await self._recall_turns(session_id, message, message_embedding)
+            if recalled:
+                prompt = f"[RELEVANT HISTORY: {' | '.join(recalled)}]\n\n{prompt}"
+            
+            response = await chat.send_message_async(prompt, stream=queue is not None)
+            text = await _response_text(response, queue)
             
+            await self._trim_history(session_id, chat)
+            
+            if cache is not None:
+                cache.put(message_embedding, text)
+            return text
+        except Exception as e:
+            logger.exception("Gemini chat error: %s", e)
+            return self._generate_fallback_response([{"role": "user", "content": message}])
+    
+    def _chat_session(self, session_id: str) -> Any:
+        """Get or create the Gemini chat session for a conversation."""
+        # One lookup, so an entry expiring between a membership test and the
+        # read can't raise KeyError
+        chat = self.chat_sessions.get(session_id)
+        if chat is None:
+            chat = self.llm_model.start_chat(history=[])
+            self.chat_sessions[session_id] = chat
+        return chat
+    
+    async def _trim_history(self, session_id: str, chat: Any) -> None:
+        """Keep the resent history bounded, moving trimmed turns to conversation memory."""
+        if len(chat.history) > MAX_CHAT_HISTORY_MESSAGES:
+            trimmed = chat.history[:-MAX_CHAT_HISTORY_MESSAGES]
+            chat.history = chat.history[-MAX_CHAT_HISTORY_MESSAGES:]
+            await self._remember_turns(session_id, trimmed)
+    
+    async def _record_turn(self, session_id: str, message: str, reply: str) -> None:
+        """
+        Add a turn answered outside the chat session (from a cache or a
+        history-free call) to the session's Gemini history, so later replies
+        (and conversation memory) still see it.
+        """
+        try:
+            chat = self._chat_session(session_id)
+            chat.history = [
+                *chat.history,
+                {"role": "user", "parts": [message]},
+                {"role": "model", "parts": [reply]},
+            ]
+            await self._trim_history(session_id, chat)
+        except Exception as e:
+            logger.exception("Chat history update error: %s", e)
+    
+    async def _draft_reply(self, message: str, context: str) -> str:
+        """
+        Generate a reply from a context alone, without reading or writing the
+        session's Gemini history; the caller records the reply if it is used.
+        """
+        if not self.llm_model:
+            return self._generate_fallback_response([{"role": "user", "content": message}])
+        try:
+            response = await self.llm_model.generate_content_async(
+                f"[CONTEXT: {context}]\n\nUser message: {message}"
+            )
             return response.text
         except Exception as e:
-            print(f"Gemini chat error: {e}")
+            logger.exception("Gemini draft error: %s", e)
             return self._generate_fallback_response([{"role": "user", "content": message}])
     
+    async def _recall_turns(
+        self,
+        session_id: str,
+        message: str,
+        message_embedding: Optional[List[float]] = None
+    ) -> List[str]:
+        """Return remembered turns relevant to a message, or [] if memory is off or empty."""
+        memory = self.conversation_memory
+        if memory is None or not memory.has(session_id):
+            return []
+        try:
+            if message_embedding is None:
+                message_embedding = await asyncio.to_thread(self.faq_rag.embed, message)
+            return memory.recall(session_id, message_embedding)
+        except Exception as e:
+            logger.exception("Conversation memory recall error: %s", e)
+            return []
+    
+    async def _remember_turns(self, session_id: str, contents: List[Any]) -> None:
+        """Store chat history entries trimmed from a Gemini session in conversation memory."""
+        memory = self.conversation_memory
+        if memory is None:
+            return
+        turns = [
+            truncate_to_tokens(f"{content.role}: {''.join(part.text for part in content.parts)}", MEMORY_TURN_TOKENS)
+            for content in contents
+        ]
+        try:
+            # Embed off the event loop, then update the memory from it
+            embeddings = await asyncio.to_thread(memory.embed, turns)
+            memory.add(session_id, turns, embeddings)
+        except Exception as e:
+            logger.exception("Conversation memory store error: %s", e)
+    
+    def _get_response_cache(self, bucket: Tuple[str, str]) -> SemanticCache:
+        """Get or create the response cache for an (intent, phase) bucket."""
+        if bucket not in self.response_caches:
+            self.response_caches[bucket] = SemanticCache(
+                threshold=RESPONSE_CACHE_THRESHOLDS.get(bucket[0], DEFAULT_RESPONSE_CACHE_THRESHOLD),
+                capacity=512,
+                ttl_seconds=3600
+            )
+        return self.response_caches[bucket]
+    
     def _generate_fallback_response(self, messages: List[Dict]) -> str:
         """Generate a fallback response when LLM is unavailable."""
         return "I'd be happy to help you schedule an appointment or answer questions about our clinic. What can I help you with today?"
@@ -351,31 +1007,27 @@ class SchedulingAgent:
         Returns:
             Dictionary with response and session info
         """
+        # One clock read per turn stamps both messages and the session update
+        now = datetime.now()
+        
         # Get or create session
+        await self.load_session(session_id)
         state = self.get_or_create_session(session_id)
         
         # Add user message to history
-        state.messages.append(ChatMessage(
-            role="user",
-            content=message,
-            timestamp=datetime.now()
-        ))
+        state.messages.append(("user", message, now))
         
         # Classify intent
-        intent, entities = await self.classify_intent(message, state.phase.value)
+        intent, entities = await self.classify_intent(message, state.phase)
         
         # Handle based on intent and phase
         response = await self._handle_intent(intent, entities, message, state)
         
         # Add assistant message to history
-        state.messages.append(ChatMessage(
-            role="assistant",
-            content=response,
-            timestamp=datetime.now()
-        ))
+        state.messages.append(("assistant", response, now))
         
         # Update session
-        self.update_session(state)
+        await self.save_session(state, now)
         
         return {
             "message": response,
@@ -385,6 +1037,42 @@ class SchedulingAgent:
             "booking_status": self._get_booking_status(state)
         }
     
+    async def process_message_stream(
+        self,
+        message: str,
+        session_id: Optional[str] = None
+    ) -> AsyncIterator[Dict]:
+        """
+        Process a user message, yielding Gemini's reply as it is generated.
+        
+        Args:
+            message: User's message
+            session_id: Optional session ID for conversation continuity
+            
+        Yields:
+            {"type": "token", "text": ...} for each chunk of a streamed reply, then
+            {"type": "done", ...} with the process_message result; its message is the
+            complete reply, which for canned or templated replies is never streamed
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def run() -> Dict:
+            try:
+                return await self.process_message(message, session_id)
+            finally:
+                queue.put_nowait(None)
+        
+        # The task copies the current context, so only this message's reply is streamed
+        stream_token = _token_stream.set(queue)
+        try:
+            task = asyncio.create_task(run())
+        finally:
+            _token_stream.reset(stream_token)
+        
+        while (text := await queue.get()) is not None:
+            yield {"type": "token", "text": text}
+        yield {"type": "done", **await task}
+    
     async def _handle_intent(
         self,
         intent: Intent,
@@ -393,84 +1081,64 @@ class SchedulingAgent:
         state: ConversationState
     ) -> str:
         """Handle user intent based on conversation phase."""
-        
-        if intent == Intent.GREETING:
-            return await self._handle_greeting(state)
-        
-        elif intent == Intent.FAQ:
-            return await self._handle_faq(message, state)
-        
-        elif intent == Intent.SCHEDULE:
-            return await self._handle_schedule_request(entities, message, state)
-        
-        elif intent == Intent.SELECT_SLOT:
-            return await self._handle_slot_selection(entities, message, state)
-        
-        elif intent == Intent.PROVIDE_INFO:
-            return await self._handle_info_provided(entities, message, state)
-        
-        elif intent == Intent.CONFIRM:
-            return await self._handle_confirmation(state)
-        
-        elif intent == Intent.DECLINE:
-            return await self._handle_decline(state)
-        
-        elif intent == Intent.CANCEL:
-            return await self._handle_cancel_request(message, state)
-        
-        elif intent == Intent.RESCHEDULE:
-            return await self._handle_reschedule_request(message, state)
-        
-        else:
+        handler = (
+            self._intent_handlers.get((intent, state.phase))
+            or self._intent_handlers.get((intent, ANY_PHASE))
+        )
+        if handler is None:
             return await self._handle_unknown(message, state)
+        return await handler(entities, message, state)
     
     async def _handle_greeting(self, state: ConversationState) -> str:
-        """Handle greeting intent using Gemini."""
+        """Handle greeting intent with a pre-written greeting (no LLM call)."""
         state.phase = ConversationPhase.GREETING
-        
-        context = (
-            "The user is greeting us. Welcome them warmly to HealthCare Plus Clinic. "
-            "Offer to help with scheduling appointments or answering questions about the clinic. "
-            "Keep the response friendly and concise (2-3 sentences max)."
-        )
-        
-        return await self.chat_with_gemini(
-            "Hi",
-            state.session_id,
-            context
-        )
+        return greeting()
     
     async def _handle_faq(self, message: str, state: ConversationState) -> str:
         """Handle FAQ questions using RAG + Gemini."""
         # Store current phase if we're in the middle of scheduling
-        was_scheduling = state.phase in [
-            ConversationPhase.UNDERSTANDING_NEEDS,
-            ConversationPhase.COLLECTING_PREFERENCES,
-            ConversationPhase.SLOT_RECOMMENDATION,
-            ConversationPhase.COLLECTING_INFO,
-        ]
+        was_scheduling = state.phase in _SCHEDULING_PHASES
         
         if was_scheduling:
             state.pending_faq = True
         
-        # Get answer from RAG
-        rag_answer = self.faq_rag.format_answer_for_chat(message)
+        # Embed the question once for both the retrieval and response caches; the
+        # model runs in a worker thread so other sessions' requests keep moving
+        try:
+            question_embedding = await asyncio.to_thread(self.faq_rag.embed, message)
+        except Exception as e:
+            logger.exception("FAQ embedding error: %s", e)
+            question_embedding = None
         
-        # Use Gemini to provide a natural response based on RAG context
-        context = (
-            f"The user is asking a question about our clinic. Here's the relevant information from our knowledge base:\n\n"
-            f"{rag_answer}\n\n"
-            f"Please provide a helpful, friendly response based on this information. "
-            f"Keep it concise and conversational."
+        # Get answer from RAG, capped so the context can't balloon the prompt
+        rag_answer = truncate_to_tokens(
+            self.faq_rag.format_answer_for_chat(message, query_embedding=question_embedding),
+            512
         )
         
+        # Use Gemini to provide a natural response based on RAG context
+        context_parts = [
+            "The user is asking a question about our clinic. Here's the relevant information from our knowledge base:\n\n",
+            rag_answer,
+            "\n\nPlease provide a helpful, friendly response based on this information. "
+            "Keep it concise and conversational.",
+        ]
         if was_scheduling:
-            context += " Also, offer to continue with scheduling their appointment."
-        
+            context_parts.append(" Also, offer to continue with scheduling their appointment.")
+        context = "".join(context_parts)
+        
+        # Questions asked before anything about the patient is known get the same
+        # answer for everyone, so it can be reused; later replies come from a chat
+        # history holding the patient's details and booking, and are never shared
+        standalone = state.phase is ConversationPhase.GREETING and not (
+            state.patient_info or state.selected_slot or state.reason_for_visit
+        )
         return await self.chat_with_gemini(
             message,
             state.session_id,
-            context
+            context,
+            cache_bucket=STANDALONE_FAQ_CACHE_BUCKET if standalone else None,
+            message_embedding=question_embedding
         )
     
     async def _handle_schedule_request(
@@ -483,8 +1151,9 @@ class SchedulingAgent:
         state.phase = ConversationPhase.UNDERSTANDING_NEEDS
         
         # Check if reason is already provided
-        if entities.get("reason") or self._extract_reason(message):
-            state.reason_for_visit = entities.get("reason") or self._extract_reason(message)
+        reason = entities.get("reason") or self._extract_reason(message)
+        if reason:
+            state.reason_for_visit = reason
             return await self._ask_appointment_type(state)
         
         context = (
@@ -500,12 +1169,8 @@ class SchedulingAgent:
     
     def _extract_reason(self, message: str) -> Optional[str]:
         """Extract reason for visit from message."""
-        reason_keywords = ["headache", "checkup", "check-up", "check up", "physical", 
-                         "follow up", "follow-up", "sick", "pain", "symptoms"]
-        message_lower = message.lower()
-        for keyword in reason_keywords:
-            if keyword in message_lower:
-                return message
+        if _keyword_hits(message.lower()) & _REASON:
+            return message
         return None
     
     async def _ask_appointment_type(self, state: ConversationState) -> str:
@@ -513,18 +1178,8 @@ class SchedulingAgent:
         reason = state.reason_for_visit or ""
         
         # Infer appointment type from reason
-        if any(kw in reason.lower() for kw in ["follow up", "follow-up", "results", "medication"]):
-            suggestion = "Follow-up (15 minutes)"
-            state.appointment_type = AppointmentType.FOLLOW_UP
-        elif any(kw in reason.lower() for kw in ["physical", "annual", "checkup", "check-up"]):
-            suggestion = "Physical Exam (45 minutes)"
-            state.appointment_type = AppointmentType.PHYSICAL_EXAM
-        elif any(kw in reason.lower() for kw in ["specialist", "complex", "detailed"]):
-            suggestion = "Specialist Consultation (60 minutes)"
-            state.appointment_type = AppointmentType.SPECIALIST_CONSULTATION
-        else:
-            suggestion = "General Consultation (30 minutes)"
-            state.appointment_type = AppointmentType.GENERAL_CONSULTATION
+        state.appointment_type = _infer_appointment_type(reason)
+        suggestion = _APPOINTMENT_TYPE_SUGGESTIONS[state.appointment_type]
         
         state.phase = ConversationPhase.COLLECTING_PREFERENCES
         
@@ -548,30 +1203,24 @@ class SchedulingAgent:
         state: ConversationState
     ) -> str:
         """Handle when user selects a time slot or asks for available slots."""
-        message_lower = message.lower()
+        # Lowercased once for every check and parse below
+        message_lower = message.lower().strip()
         
         # Check if user is asking for available slots (not selecting one)
-        availability_keywords = ["earliest", "available slots", "available", "slots", "what times", "when can"]
-        if any(kw in message_lower for kw in availability_keywords):
-            # User wants to see available slots
-            if entities.get("date"):
-                state.preferred_date = entities["date"]
-            if entities.get("time_preference"):
-                state.preferred_time_of_day = entities["time_preference"]
+        if _keyword_hits(message_lower) & _AVAILABILITY:
+            # User wants to see available slots; classify_intent already parsed the message
+            self._apply_date_time_preferences(message, state, entities)
             return await self._show_available_slots(state)
         
         # Parse the selection
-        if state.phase == ConversationPhase.SLOT_RECOMMENDATION:
+        if state.phase is ConversationPhase.SLOT_RECOMMENDATION:
             # Try to match the selection to available slots
-            selected = self._parse_slot_selection(message, state)
+            selected = self._parse_slot_selection(message_lower, state)
             
             if selected:
                 state.selected_slot = selected
                 state.phase = ConversationPhase.COLLECTING_INFO
                 
-                # Format the selected time
-                date_str = selected.get("date", "")
-                time_str = selected.get("start_time", "")
                 scheduling_url = selected.get("scheduling_url", "")
                 
                 # Store scheduling URL if available (for real Calendly)
@@ -579,18 +1228,9 @@ class SchedulingAgent:
                     state.scheduling_url = scheduling_url
                 
                 # Format date and time for display
-                formatted_date = date_str or "the selected date"
-                formatted_time = time_str or "the selected time"
-                
-                try:
-                    if date_str:
-                        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                        formatted_date = date_obj.strftime("%A, %B %d")
-                    if time_str:
-                        time_obj = datetime.strptime(time_str, "%H:%M")
-                        formatted_time = time_obj.strftime("%I:%M %p").lstrip("0")
-                except ValueError:
-                    pass  # Keep the original strings if parsing fails
+                formatted_date, formatted_time = _format_slot(
+                    selected.get("date") or "", selected.get("start_time") or ""
+                )
                 
                 duration = APPOINTMENT_DURATIONS.get(state.appointment_type, 30)
                 
@@ -620,89 +1260,33 @@ class SchedulingAgent:
         
         return await self._handle_unknown(message, state)
     
-    def _parse_slot_selection(self, message: str, state: ConversationState) -> Optional[Dict]:
-        """Parse user's slot selection and match to available slots."""
-        message_lower = message.lower()
-        
-        # Get stored available slots from state
-        available_slots = getattr(state, 'available_slots', [])
-        
-        # Default to tomorrow if no preferred date
-        default_date = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
-        selected_date = state.preferred_date or default_date
-        selected_time = None
-        
-        # Check for day names
-        days_map = {
-            "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-            "friday": 4, "saturday": 5, "sunday": 6,
-            "tomorrow": None, "today": None
-        }
-        
-        # Extract day
-        for day_name in days_map.keys():
-            if day_name in message_lower:
-                if day_name == "today":
-                    selected_date = datetime.now().strftime("%Y-%m-%d")
-                elif day_name == "tomorrow":
-                    selected_date = (datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + 
-                                   timedelta(days=1)).strftime("%Y-%m-%d")
-                else:
-                    # Calculate the date for the given day name
-                    selected_date = parse_date_reference(day_name)
-                break
-        
-        # Extract time
-        time_patterns = [
-            (r'(\d{1,2}):(\d{2})\s*(am|pm)?', lambda m: self._normalize_time(m.group(1), m.group(2), m.group(3))),
-            (r'(\d{1,2})\s*(am|pm)', lambda m: self._normalize_time(m.group(1), "00", m.group(2))),
-        ]
-        
-        for pattern, normalizer in time_patterns:
-            match = re.search(pattern, message_lower)
-            if match:
-                selected_time = normalizer(match)
-                break
+    def _parse_slot_selection(self, message_lower: str, state: ConversationState) -> Dict:
+        """Parse user's slot selection (lowercased and stripped) and match to available slots."""
+        # One parse of the message; defaults to the preferred date, or tomorrow,
+        # if no day is named, so a date is always selected
+        selected_date, selected_time = _parse_slot_text(
+            message_lower,
+            state.preferred_date,
+            date.today()
+        )
         
-        # Try to find matching slot in available_slots (to get scheduling_url)
-        if selected_time and available_slots:
-            for slot in available_slots:
-                if slot.get("start_time") == selected_time:
-                    return {
-                        "date": selected_date or state.preferred_date,
-                        "start_time": selected_time,
-                        "scheduling_url": slot.get("scheduling_url", "")
-                    }
-        
-        if selected_date and selected_time:
-            return {
-                "date": selected_date,
-                "start_time": selected_time,
-                "scheduling_url": ""
-            }
-        elif selected_date:
-            # If only date is selected, might need more info
-            return {
-                "date": selected_date,
-                "start_time": selected_time,
-                "scheduling_url": ""
-            }
+        # Match the slot fetched for the shown date to get its end_time and
+        # scheduling_url without another availability request; without a time
+        # the caller asks for more info
+        slot = None
+        if selected_time and selected_date == state.preferred_date:
+            slot = next(
+                (s for s in state.available_slots or () if s.get("start_time") == selected_time),
+                None
+            )
+        if slot is not None:
+            return {"scheduling_url": "", **slot, "date": selected_date}
         
-        return None
-    
-    def _normalize_time(self, hour: str, minute: str, ampm: Optional[str]) -> str:
-        """Normalize time to 24-hour format."""
-        h = int(hour)
-        m = int(minute)
-        
-        if ampm:
-            ampm = ampm.lower()
-            if ampm == "pm" and h != 12:
-                h += 12
-            elif ampm == "am" and h == 12:
-                h = 0
-        
-        return f"{h:02d}:{m:02d}"
+        return {
+            "date": selected_date,
+            "start_time": selected_time,
+            "scheduling_url": ""
+        }
     
     async def _handle_info_provided(
         self,
@@ -710,42 +1294,28 @@ class SchedulingAgent:
         message: str,
         state: ConversationState
     ) -> str:
-        """Handle when user provides information."""
-        if state.phase != ConversationPhase.COLLECTING_INFO:
-            return await self._handle_unknown(message, state)
-        
-        # Initialize patient_info if needed
-        if state.patient_info is None:
-            state.patient_info = {}
-        
-        # Update with extracted entities
-        if entities.get("email"):
-            state.patient_info["email"] = entities["email"]
-        elif entities.get("phone"):
-            state.patient_info["phone"] = entities["phone"]
-        else:
-            # Check for email in message
-            email_match = re.search(r'[\w\.-]+@[\w\.-]+\.\w+', message)
-            if email_match:
-                state.patient_info["email"] = email_match.group()
-            # Check for phone in message
-            elif re.search(r'[\d\-\(\)\s\+]{10,}', message):
-                phone_match = re.search(r'[\d\-\(\)\s\+]{10,}', message)
-                state.patient_info["phone"] = phone_match.group().strip()
-            # Assume it's a name if we don't have one
-            elif not state.patient_info.get("name"):
-                state.patient_info["name"] = message.strip()
-        
-        # Check what's still missing
-        missing = []
-        if not state.patient_info.get("name"):
-            missing.append("name")
-        if not state.patient_info.get("phone"):
-            missing.append("phone number")
-        if not state.patient_info.get("email"):
-            missing.append("email address")
-        
-        if missing:
+        """Handle when user provides information while contact details are being collected."""
+        # Update with every field the extractors found, so a message carrying
+        # name, phone and email together goes straight to booking
+        extracted = extract_contact_info(message)
+        extracted.update({k: v for k, v in entities.items() if k in CONTACT_FIELDS and v})
+        if extracted.get("email"):
+            state.set_patient_field("email", extracted["email"])
+        if extracted.get("phone"):
+            state.set_patient_field("phone", extracted["phone"])
+        if "name" in state.missing_contact_fields:
+            if extracted.get("name"):
+                state.set_patient_field("name", extracted["name"])
+            elif not extracted and message.strip() and not NAME_INTRO_RE.search(message):
+                # Assume it's a name if nothing else was recognised; an introduction
+                # the extractor found no name in ("I am not sure") isn't one
+                state.set_patient_field("name", message.strip())
+        
+        if state.missing_contact_fields:
+            missing = [
+                label for field, label in (("name", "name"), ("phone", "phone number"), ("email", "email address"))
+                if field in state.missing_contact_fields
+            ]
             context = (
                 f"The user just provided some of their information. We still need: {', '.join(missing)}. "
                 f"Thank them and ask for the missing information in a friendly way."
@@ -758,186 +1328,93 @@ class SchedulingAgent:
         
         # All info collected - automatically book the appointment
         state.phase = ConversationPhase.CONFIRMATION
+        return await self._handle_confirmation(state)
+    
+    async def _confirm_preferences(self, state: ConversationState) -> str:
+        """User confirmed the appointment type; show available slots."""
+        last_user_msg = ""
+        for role, content, _timestamp in reversed(state.messages):
+            if role == "user":
+                last_user_msg = content
+                break
         
-        slot = state.selected_slot or {}
-        patient_info = state.patient_info or {}
-        
-        # Get scheduling URL if stored (for real Calendly)
-        scheduling_url = getattr(state, 'scheduling_url', None) or slot.get('scheduling_url', '')
-        
-        # Book the appointment directly
-        result = await self.booking_tool.book_appointment(
-            appointment_type=state.appointment_type.value if state.appointment_type else "consultation",
-            date=slot.get("date", ""),
-            start_time=slot.get("start_time", ""),
-            patient_name=patient_info.get("name", ""),
-            patient_email=patient_info.get("email", ""),
-            patient_phone=patient_info.get("phone", ""),
-            reason=state.reason_for_visit or "General consultation",
-            scheduling_url=scheduling_url
-        )
-        
-        if result.get("success"):
-            state.phase = ConversationPhase.COMPLETED
-            
-            # Format date/time for display
-            date_str = slot.get("date", "")
-            time_str = slot.get("start_time", "")
-            
-            try:
-                date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                formatted_date = date_obj.strftime("%A, %B %d, %Y")
-                time_obj = datetime.strptime(time_str, "%H:%M")
-                formatted_time = time_obj.strftime("%I:%M %p").lstrip("0")
-            except ValueError:
-                formatted_date = date_str or "scheduled date"
-                formatted_time = time_str or "scheduled time"
+        self._apply_date_time_preferences(last_user_msg, state)
+        return await self._show_available_slots(state)
+    
+    async def _confirm_slot(self, state: ConversationState) -> str:
+        """User confirmed a slot; move on to collecting contact details using Gemini."""
+        # User is confirming a slot selection - move to collecting info
+        # Check if there's a selected slot
+        if state.selected_slot:
+            state.phase = ConversationPhase.COLLECTING_INFO
             
-            appt_type = state.appointment_type.value if state.appointment_type else "consultation"
-            duration = APPOINTMENT_DURATIONS.get(state.appointment_type, 30)
-            confirmation_number = result.get("confirmation_number", "HCP" + str(uuid.uuid4())[:6].upper())
+            slot = state.selected_slot
+            formatted_date, formatted_time = _format_slot(
+                slot.get("date") or "", slot.get("start_time") or ""
+            )
             
-            # Check if this is a real Calendly booking (needs user action)
-            if result.get("status") == "pending_user_action" and result.get("scheduling_url"):
-                booking_url = result.get("scheduling_url")
-                context = (
-                    f"The appointment details have been prepared! To complete the booking and receive a confirmation email, "
-                    f"the user needs to click this Calendly link: {booking_url}\n\n"
-                    f"Details:\n"
-                    f"- Date: {formatted_date}\n"
-                    f"- Time: {formatted_time}\n"
-                    f"- Duration: {duration} minutes\n"
-                    f"- Name: {patient_info.get('name', 'N/A')}\n"
-                    f"- Email: {patient_info.get('email', 'N/A')}\n\n"
-                    f"Explain they need to click the link to finalize. Be warm and include the link."
-                )
-            else:
-                context = (
-                    f"🎉 APPOINTMENT CONFIRMED! Create a warm confirmation message with:\n"
-                    f"- Confirmation #: {confirmation_number}\n"
-                    f"- Date: {formatted_date}\n"
-                    f"- Time: {formatted_time}\n"
-                    f"- Duration: {duration} minutes\n"
-                    f"- Patient: {patient_info.get('name', 'N/A')}\n"
-                    f"- Phone: {patient_info.get('phone', 'N/A')}\n"
-                    f"- Email: {patient_info.get('email', 'N/A')}\n"
-                    f"- Reason: {state.reason_for_visit or 'General consultation'}\n\n"
-                    f"Use emojis (📅✅) and remind about 24-hour cancellation policy. Be cheerful!"
-                )
+            context = (
+                f"The user has confirmed they want to book an appointment on {formatted_date} at {formatted_time}. "
+                f"Now ask for their full name, phone number, and email address to complete the booking. "
+                f"Be friendly and professional."
+            )
             
+            return await self.chat_with_gemini("confirm slot", state.session_id, context)
+        else:
+            # No slot selected yet, ask them to select
             return await self.chat_with_gemini(
-                "booking confirmed",
+                "confirm",
                 state.session_id,
-                context
+                _STATIC_CONTEXTS["confirm_without_slot"],
+                context_id="confirm_without_slot"
             )
+    
+    async def _confirm_contact_info(self, state: ConversationState) -> str:
+        """User said yes while contact details were being collected."""
+        # User is confirming while we're collecting info - check what we have
+        if not state.missing_contact_fields:
+            # All info collected, move to final confirmation
+            state.phase = ConversationPhase.CONFIRMATION
+            return await self._handle_confirmation(state)
         else:
+            # Still need info
+            missing = [
+                label for field, label in (("name", "full name"), ("phone", "phone number"), ("email", "email address"))
+                if field in state.missing_contact_fields
+            ]
+            
             context = (
-                f"There was an error booking: {result.get('error', 'Unknown error')}. "
-                f"Apologize and offer to try again or call +1-555-123-4567."
+                f"The user said yes but we still need their {', '.join(missing)} to complete the booking. "
+                f"Kindly ask them to provide this information."
             )
-            return await self.chat_with_gemini("booking failed", state.session_id, context)
-
+            return await self.chat_with_gemini(
+                "need info",
+                state.session_id,
+                context,
+                context_id=f"need_info:{'/'.join(missing)}"
+            )
+    
+    async def _confirm_unclear(self, state: ConversationState) -> str:
+        """User said something affirmative outside a confirmable phase."""
+        return await self.chat_with_gemini(
+            "yes",
+            state.session_id,
+            _STATIC_CONTEXTS["confirm_unclear"],
+            context_id="confirm_unclear"
+        )
+    
     async def _handle_confirmation(self, state: ConversationState) -> str:
-        """Handle booking confirmation using Gemini."""
-        
-        # Handle confirmation based on current phase
-        if state.phase == ConversationPhase.COLLECTING_PREFERENCES:
-            # User confirmed appointment type, now show available slots
-            last_user_msg = ""
-            for msg in reversed(state.messages):
-                if msg.role == "user":
-                    last_user_msg = msg.content
-                    break
-            
-            # Parse date from the message
-            date = parse_date_reference(last_user_msg)
-            time_pref = parse_time_preference(last_user_msg)
-            
-            if date:
-                state.preferred_date = date
-            if time_pref != "any":
-                state.preferred_time_of_day = time_pref
-            
-            return await self._show_available_slots(state)
-        
-        elif state.phase == ConversationPhase.SLOT_RECOMMENDATION:
-            # User is confirming a slot selection - move to collecting info
-            # Check if there's a selected slot
-            if state.selected_slot:
-                state.phase = ConversationPhase.COLLECTING_INFO
-                
-                slot = state.selected_slot
-                date_str = slot.get("date", "")
-                time_str = slot.get("start_time", "")
-                
-                formatted_date = date_str or "the selected date"
-                formatted_time = time_str or "the selected time"
-                
-                try:
-                    if date_str:
-                        date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-                        formatted_date = date_obj.strftime("%A, %B %d")
-                    if time_str:
-                        time_obj = datetime.strptime(time_str, "%H:%M")
-                        formatted_time = time_obj.strftime("%I:%M %p").lstrip("0")
-                except ValueError:
-                    pass
-                
-                context = (
-                    f"The user has confirmed they want to book an appointment on {formatted_date} at {formatted_time}. "
-                    f"Now ask for their full name, phone number, and email address to complete the booking. "
-                    f"Be friendly and professional."
-                )
-                
-                return await self.chat_with_gemini("confirm slot", state.session_id, context)
-            else:
-                # No slot selected yet, ask them to select
-                context = (
-                    "The user wants to confirm but hasn't selected a specific time slot yet. "
-                    "Ask them which of the available times works best for them."
-                )
-                return await self.chat_with_gemini("confirm", state.session_id, context)
-        
-        elif state.phase == ConversationPhase.COLLECTING_INFO:
-            # User is confirming while we're collecting info - check what we have
-            if state.patient_info and all([
-                state.patient_info.get("name"),
-                state.patient_info.get("phone"),
-                state.patient_info.get("email")
-            ]):
-                # All info collected, move to final confirmation
-                state.phase = ConversationPhase.CONFIRMATION
-                return await self._handle_confirmation(state)
-            else:
-                # Still need info
-                missing = []
-                if not state.patient_info or not state.patient_info.get("name"):
-                    missing.append("full name")
-                if not state.patient_info or not state.patient_info.get("phone"):
-                    missing.append("phone number")
-                if not state.patient_info or not state.patient_info.get("email"):
-                    missing.append("email address")
-                
-                context = (
-                    f"The user said yes but we still need their {', '.join(missing)} to complete the booking. "
-                    f"Kindly ask them to provide this information."
-                )
-                return await self.chat_with_gemini("need info", state.session_id, context)
-        
-        elif state.phase != ConversationPhase.CONFIRMATION:
-            # Unknown phase, ask what they want to confirm
-            context = "The user said something affirmative. Ask what they'd like to confirm or help with."
-            return await self.chat_with_gemini("yes", state.session_id, context)
-        
-        # Book the appointment
+        """Book the confirmed appointment and report the result."""
         slot = state.selected_slot or {}
         patient_info = state.patient_info or {}
+        appt_type = state.appointment_type.value if state.appointment_type else "consultation"
         
         # Get scheduling URL if stored (for real Calendly)
         scheduling_url = getattr(state, 'scheduling_url', None) or slot.get('scheduling_url', '')
         
-        result = await self.booking_tool.book_appointment(
-            appointment_type=state.appointment_type.value if state.appointment_type else "consultation",
+        # Book in the background so the reply can be drafted at the same time
+        booking = asyncio.create_task(self.booking_tool.book_appointment(
+            appointment_type=appt_type,
             date=slot.get("date", ""),
             start_time=slot.get("start_time", ""),
             patient_name=patient_info.get("name", ""),
@@ -945,154 +1422,110 @@ class SchedulingAgent:
             patient_phone=patient_info.get("phone", ""),
             reason=state.reason_for_visit or "General consultation",
             scheduling_url=scheduling_url
-        )
+        ))
         
-        if result.get("success"):
-            state.phase = ConversationPhase.COMPLETED
-            
-            # Check if this is a real Calendly booking (needs user action)
-            if result.get("status") == "pending_user_action" and result.get("scheduling_url"):
-                # Real Calendly - provide the booking link
-                booking_url = result.get("scheduling_url")
-                context = (
-                    f"The appointment details have been prepared! However, to complete the booking "
-                    f"and receive a confirmation email, the user needs to click this Calendly link:\n\n"
-                    f"🔗 {booking_url}\n\n"
-                    f"Details prepared:\n"
-                    f"- Date: {slot.get('date', 'N/A')}\n"
-                    f"- Time: {slot.get('start_time', 'N/A')}\n"
-                    f"- Name: {patient_info.get('name', 'N/A')}\n"
-                    f"- Email: {patient_info.get('email', 'N/A')}\n\n"
-                    f"Explain that they need to click the link to finalize the booking. "
-                    f"Calendly will send them a confirmation email with all the details. "
-                    f"Be warm and helpful. Make sure to include the actual booking link in your response."
-                )
-            else:
-                # Mock Calendly - booking is complete
-                booking_details = self.booking_tool.format_confirmation_message(result)
-                context = (
-                    f"The appointment was successfully booked! Here are the details:\n\n{booking_details}\n\n"
-                    f"Create a warm, professional confirmation message. Include the booking confirmation number "
-                    f"and remind them about any preparation needed. Wish them well."
-                )
-            
-            return await self.chat_with_gemini(
-                "confirm my booking",
-                state.session_id,
-                context
-            )
-        else:
-            context = (
-                f"There was an error booking the appointment: {result.get('error', 'Unknown error')}. "
-                f"Apologize for the inconvenience and offer alternatives like trying a different time "
-                f"or calling the office at +1-555-123-4567."
+        # A real Calendly booking ends with a link for the user to click, so Gemini
+        # can write that reply with a placeholder while the link is being fetched
+        draft = None
+        if self.booking_tool.use_real_calendly:
+            context = _BOOKING_LINK_CONTEXT_TEMPLATE.format(
+                date=slot.get("date", "N/A"),
+                time=slot.get("start_time", "N/A"),
+                name=patient_info.get("name", "N/A"),
+                email=patient_info.get("email", "N/A")
             )
+            # Drafted outside the chat session, so a draft that ends up unused
+            # leaves nothing behind in the session's history
+            draft = asyncio.create_task(self._draft_reply("confirm my booking", context))
+        
+        try:
+            result = await booking
             
-            return await self.chat_with_gemini(
-                "booking failed",
-                state.session_id,
-                context
-            )
+            if result.get("success"):
+                state.phase = ConversationPhase.COMPLETED
+                self.availability_tool.invalidate(slot.get("date", ""))
+                
+                # Check if this is a real Calendly booking (needs user action)
+                booking_url = result.get("scheduling_url")
+                if result.get("status") == "pending_user_action" and booking_url and draft is not None:
+                    response = await draft
+                    if BOOKING_LINK_PLACEHOLDER in response:
+                        response = response.replace(BOOKING_LINK_PLACEHOLDER, booking_url)
+                    else:
+                        response = f"{response}\n\n🔗 {booking_url}"
+                    # Only the final reply, with the real link, goes into the history
+                    await self._record_turn(state.session_id, "confirm my booking", response)
+                    return response
+                
+                # Mock Calendly - booking is complete; the confirmation template
+                # already has every detail, so reply with it directly (no LLM call)
+                return self.booking_tool.format_confirmation_message(result)
+        finally:
+            if draft is not None and not draft.done():
+                draft.cancel()
+        
+        context = (
+            f"There was an error booking the appointment: {result.get('error', 'Unknown error')}. "
+            f"Apologize for the inconvenience and offer alternatives like trying a different time "
+            f"or calling the office at +1-555-123-4567."
+        )
+        
+        return await self.chat_with_gemini(
+            "booking failed",
+            state.session_id,
+            context
+        )
     
     async def _ask_for_date_preference(self, state: ConversationState) -> str:
         """Ask user for their date and time preferences using Gemini."""
         state.phase = ConversationPhase.COLLECTING_PREFERENCES
         
-        context = (
-            "The user has confirmed their appointment type. Now ask about their preferred date and time. "
-            "Ask if they prefer morning or afternoon, and if they have a specific date in mind or want earliest availability. "
-            "Keep it conversational and friendly."
-        )
-        
         return await self.chat_with_gemini(
             "when can I come in",
             state.session_id,
-            context
+            _STATIC_CONTEXTS["ask_date_preference"],
+            context_id="ask_date_preference"
         )
     
     async def _handle_decline(self, state: ConversationState) -> str:
         """Handle when user declines options using Gemini."""
-        if state.phase == ConversationPhase.SLOT_RECOMMENDATION:
-            context = (
-                "The user declined the offered time slots. Offer to check different dates "
-                "or ask if they have a specific day/time preference. Be understanding and helpful."
-            )
-        elif state.phase == ConversationPhase.CONFIRMATION:
-            context = (
-                "The user doesn't want to confirm the appointment as is. "
-                "Ask if they'd like to change any details or start over with a different time. "
-                "Be accommodating."
-            )
-        else:
-            context = "The user declined something. Ask how else you can help them today."
+        context = _DECLINE_CONTEXTS.get(state.phase)
+        if context is None:
+            return CANNED_RESPONSES[Intent.DECLINE.value]
         
         return await self.chat_with_gemini(
             "no",
             state.session_id,
-            context
+            context,
+            context_id=f"decline:{state.phase.value}"
         )
     
     async def _handle_cancel_request(self, message: str, state: ConversationState) -> str:
-        """Handle appointment cancellation request using Gemini."""
-        context = (
-            "The user wants to cancel their appointment. Explain that you need their booking ID "
-            "or confirmation code (found in their confirmation email) to proceed. "
-            "Be empathetic and professional."
-        )
-        
-        return await self.chat_with_gemini(
-            message,
-            state.session_id,
-            context
-        )
+        """Handle appointment cancellation request by asking for the booking ID (no LLM call)."""
+        return CANNED_RESPONSES[Intent.CANCEL.value]
     
     async def _handle_reschedule_request(self, message: str, state: ConversationState) -> str:
-        """Handle appointment rescheduling request using Gemini."""
-        context = (
-            "The user wants to reschedule their appointment. Explain that you need their booking ID "
-            "or confirmation code, then you can help find a new time. Be helpful and understanding."
-        )
-        
-        return await self.chat_with_gemini(
-            message,
-            state.session_id,
-            context
-        )
+        """Handle appointment rescheduling request by asking for the booking ID (no LLM call)."""
+        return CANNED_RESPONSES[Intent.RESCHEDULE.value]
     
     async def _handle_unknown(self, message: str, state: ConversationState) -> str:
         """Handle unknown or ambiguous intent using Gemini."""
         # Check if it might be continuing a previous topic
-        if state.phase == ConversationPhase.UNDERSTANDING_NEEDS:
+        if state.phase is ConversationPhase.UNDERSTANDING_NEEDS:
             # Assume they're providing reason for visit
             state.reason_for_visit = message
             return await self._ask_appointment_type(state)
         
-        elif state.phase == ConversationPhase.COLLECTING_PREFERENCES:
-            # Try to extract date/time preferences
-            date = parse_date_reference(message)
-            time_pref = parse_time_preference(message)
-            
-            if date:
-                state.preferred_date = date
-            if time_pref != "any":
-                state.preferred_time_of_day = time_pref
-            
-            if date or time_pref != "any":
+        elif state.phase is ConversationPhase.COLLECTING_PREFERENCES:
+            # Try to extract date/time preferences, unless there's nothing to parse
+            if _DATE_HINT_RE.search(message) and self._apply_date_time_preferences(message, state):
                 return await self._show_available_slots(state)
         
         # Use Gemini for a helpful response
-        context = (
-            "The user's intent wasn't clear. Politely explain that you can help with:\n"
-            "- Scheduling new appointments\n"
-            "- Answering questions about the clinic (insurance, hours, location, etc.)\n"
-            "- Rescheduling or canceling existing appointments\n\n"
-            "Ask how you can assist them. Keep it friendly and brief."
-        )
-        
         return await self.chat_with_gemini(
             message,
             state.session_id,
-            context
+            _UNKNOWN_MENU_CONTEXT
         )
     
     async def _show_available_slots(self, state: ConversationState) -> str:
@@ -1110,36 +1543,39 @@ class SchedulingAgent:
         
         appt_type = state.appointment_type.value if state.appointment_type else "consultation"
         
-        # Get availability from Calendly API (mock or real)
-        result = await self.availability_tool.get_available_slots(date, appt_type)
-        
-        if not result.get("success"):
-            context = (
-                "There was an issue checking availability. Apologize for the inconvenience "
-                "and suggest trying again or calling the office at +1-555-123-4567."
-            )
-            return await self.chat_with_gemini("check availability", state.session_id, context)
-        
-        available_slots = result.get("available_slots", [])
+        # Get availability from Calendly API (mock or real), fetching alternative
+        # dates at the same time so an empty or failed day costs no extra round trip
+        alt_request = asyncio.create_task(_failure_as_result(
+            self.availability_tool.get_available_dates(14, appt_type), "Alternative dates"
+        ))
+        result = await _failure_as_result(
+            self.availability_tool.get_available_slots(date, appt_type), "Availability"
+        )
         
-        # Filter by time preference if specified
-        if state.preferred_time_of_day:
-            filtered = self.availability_tool.get_slots_for_time_preference(
-                available_slots, state.preferred_time_of_day
-            )
-            if filtered:
-                available_slots = filtered
+        # Pick the slots to offer here so the LLM only has to phrase them; if the
+        # day itself couldn't be fetched, the alternative dates are offered instead
+        display_slots = self._select_best_slots(
+            result.get("available_slots", []),
+            state.preferred_time_of_day,
+            start_hours=result.get("start_hours")
+        )
         
-        if not available_slots:
-            # Get alternative dates from mock Calendly API
-            alt_result = await self.availability_tool.get_available_dates(14, appt_type)
-            alt_dates = alt_result.get("available_dates", [])[:5]
+        if display_slots:
+            # Alternatives are only needed when the day has nothing to offer
+            alt_request.cancel()
+        else:
+            alt_result = await alt_request
+            alt_dates = alt_result.get("display_lines", [])[:5] if alt_result.get("success") else []
+            
+            if not result.get("success") and not alt_dates:
+                context = (
+                    "There was an issue checking availability. Apologize for the inconvenience "
+                    "and suggest trying again or calling the office at +1-555-123-4567."
+                )
+                return await self.chat_with_gemini("check availability", state.session_id, context)
             
             if alt_dates:
-                alt_text = "\n".join([
-                    f"- {d['day_name']}, {d['date']} ({d['available_slots']} slots available)"
-                    for d in alt_dates
-                ])
+                alt_text = "\n".join(alt_dates)
                 context = (
                     f"No slots available on {date} matching the user's preferences. "
                     f"Here are alternative dates:\n{alt_text}\n\n"
@@ -1153,34 +1589,17 @@ class SchedulingAgent:
             
             return await self.chat_with_gemini("no availability", state.session_id, context)
         
-        # Format slots for display (show up to 5)
-        display_slots = available_slots[:5]
+        # Keep every open slot of the day (with end_time and scheduling_url), so the
+        # selection next turn is matched locally even if it wasn't one of those offered
+        state.available_slots = result.get("available_slots", [])
         
-        # Store available slots in state for later reference (includes scheduling_url)
-        state.available_slots = display_slots
+        formatted_date = _format_date_long(date)
         
-        try:
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
-            formatted_date = date_obj.strftime("%A, %B %d")
-        except ValueError:
-            formatted_date = date
-        
-        slots_text = []
-        for slot in display_slots:
-            try:
-                time_obj = datetime.strptime(slot["start_time"], "%H:%M")
-                formatted_time = time_obj.strftime("%I:%M %p").lstrip("0")
-            except ValueError:
-                formatted_time = slot["start_time"]
-            slots_text.append(formatted_time)
-        
-        time_pref_text = state.preferred_time_of_day if state.preferred_time_of_day else "any"
-        
-        context = (
-            f"Available slots for {formatted_date} ({time_pref_text} preference):\n"
-            f"- {', '.join(slots_text)}\n\n"
-            f"Present these time options in a friendly, conversational way "
-            f"and ask which time works best for the user."
+        context = render_slot_recommendation(
+            date=formatted_date,
+            time_preference=state.preferred_time_of_day or "any",
+            k=len(display_slots),
+            formatted_slots=", ".join(_format_time_12h(slot["start_time"]) for slot in display_slots)
         )
         
         return await self.chat_with_gemini(
@@ -1189,9 +1608,68 @@ class SchedulingAgent:
             context
         )
     
+    def _apply_date_time_preferences(
+        self,
+        message: str,
+        state: ConversationState,
+        entities: Optional[Dict] = None
+    ) -> bool:
+        """
+        Store any date or time-of-day preference mentioned in a message.
+        
+        Args:
+            message: User's message
+            state: Conversation state to update
+            entities: Entities already parsed from the message this turn; when
+                given, their "date"/"time_preference" are used instead of re-parsing
+            
+        Returns:
+            True if a date or time preference was found
+        """
+        if entities is not None:
+            date = entities.get("date")
+            time_pref = entities.get("time_preference")
+        else:
+            date = parse_date_reference(message)
+            time_pref = _time_preference_or_none(message)
+        
+        if date:
+            state.preferred_date = date
+        if time_pref:
+            state.preferred_time_of_day = time_pref
+        
+        return bool(date or time_pref)
+    
+    def _select_best_slots(
+        self,
+        slots: List[Dict],
+        time_preference: Optional[str],
+        k: int = 5,
+        start_hours: Optional[List[int]] = None
+    ) -> List[Dict]:
+        """
+        Pick the slots to offer the patient.
+        
+        Args:
+            slots: Available slots for the requested date
+            time_preference: "morning", "afternoon", "evening", or None
+            k: Maximum number of slots to offer
+            start_hours: Start hour of each slot, parsed once when they were fetched
+            
+        Returns:
+            Up to k slots, preferring those that match the time preference
+        """
+        if time_preference:
+            filtered = self.availability_tool.get_slots_for_time_preference(
+                slots, time_preference, limit=k, start_hours=start_hours
+            )
+            if filtered:
+                slots = filtered
+        return slots[:k]
+    
     def _get_booking_status(self, state: ConversationState) -> Optional[Dict]:
         """Get current booking status for response."""
-        if state.phase == ConversationPhase.COMPLETED and state.selected_slot:
+        if state.phase is ConversationPhase.COMPLETED and state.selected_slot:
             return {
                 "status": "completed",
                 "date": state.selected_slot.get("date"),
@@ -0,0 +1,126 @@
+"""
+Shared conversation state storage.
+Sessions are kept in Redis as msgpack so every worker process sees the same
+conversation; the agent's in-process session cache stays in front of it.
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+
+# Only needed when REDIS_URL is set
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    from redis.asyncio import Redis
+except ImportError:
+    Redis = None
+
+from models.schemas import (
+    MAX_CONVERSATION_MESSAGES,
+    AppointmentType,
+    ConversationPhase,
+    ConversationState,
+)
+
+
+# Key prefix for sessions in Redis
+SESSION_KEY_PREFIX = "sess:"
+_MISSING_DEPENDENCIES = "redis and msgspec not installed. Run: pip install redis msgspec"
+
+if msgspec is not None:
+    class StoredState(msgspec.Struct):
+        """
+        ConversationState's fields as stored in Redis.
+        msgspec types them while decoding, so the pydantic model can be built
+        without running its validation a second time.
+        """
+        session_id: str
+        phase: ConversationPhase
+        appointment_type: Optional[AppointmentType]
+        preferred_date: Optional[str]
+        preferred_time_of_day: Optional[str]
+        selected_slot: Optional[dict]
+        patient_info: Optional[dict]
+        missing_contact_fields: Set[str]
+        reason_for_visit: Optional[str]
+        messages: List[Tuple[str, str, datetime]]
+        pending_faq: bool
+        available_slots: Optional[List[dict]]
+        scheduling_url: Optional[str]
+        created_at: datetime
+        updated_at: datetime
+    
+    _ENCODER = msgspec.msgpack.Encoder()
+    _DECODER = msgspec.msgpack.Decoder(StoredState)
+
+
+def pack_state(state: ConversationState) -> bytes:
+    """Serialize a conversation state to msgpack."""
+    if msgspec is None:
+        raise ImportError(_MISSING_DEPENDENCIES)
+    fields = {name: getattr(state, name) for name in StoredState.__struct_fields__}
+    fields["messages"] = list(state.messages)
+    return _ENCODER.encode(StoredState(**fields))
+
+
+def unpack_state(data: bytes) -> ConversationState:
+    """Deserialize a conversation state packed by pack_state."""
+    if msgspec is None:
+        raise ImportError(_MISSING_DEPENDENCIES)
+    fields = msgspec.structs.asdict(_DECODER.decode(data))
+    fields["messages"] = deque(fields["messages"], maxlen=MAX_CONVERSATION_MESSAGES)
+    return ConversationState.model_construct(**fields)
+
+
+class RedisSessionStore:
+    """
+    Conversation states in Redis, expiring after a period without updates.
+    """
+    
+    def __init__(self, url: str, ttl_seconds: int = 3600):
+        """
+        Initialize the store.
+        
+        Args:
+            url: Redis connection URL, e.g. redis://localhost:6379/0
+            ttl_seconds: Lifetime of a session after its last update
+        """
+        if Redis is None or msgspec is None:
+            raise ImportError(_MISSING_DEPENDENCIES)
+        
+        self.ttl_seconds = ttl_seconds
+        self._redis = Redis.from_url(url)
+    
+    async def get(self, session_id: str) -> Optional[ConversationState]:
+        """
+        Load a session.
+        
+        Args:
+            session_id: Session to load
+            
+        Returns:
+            The stored state, or None if it doesn't exist or has expired
+        """
+        data = await self._redis.get(SESSION_KEY_PREFIX + session_id)
+        return unpack_state(data) if data is not None else None
+    
+    async def put(self, state: ConversationState) -> None:
+        """Store a session, restarting its TTL."""
+        await self._redis.setex(SESSION_KEY_PREFIX + state.session_id, self.ttl_seconds, pack_state(state))
+    
+    async def delete(self, session_id: str) -> bool:
+        """Delete a session, returning whether it existed."""
+        return bool(await self._redis.delete(SESSION_KEY_PREFIX + session_id))
+    
+    async def clear(self) -> None:
+        """Delete every stored session."""
+        keys = [key async for key in self._redis.scan_iter(match=SESSION_KEY_PREFIX + "*")]
+        if keys:
+            await self._redis.delete(*keys)
+    
+    async def close(self) -> None:
+        """Close the Redis connection pool."""
+        await self._redis.aclose()
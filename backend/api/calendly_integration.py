@@ -3,12 +3,13 @@ Mock Calendly API Integration for the Medical Appointment Scheduling Agent.
 Provides endpoints for checking availability and booking appointments.
 """
 
-import json
 import random
 import string
+from collections import defaultdict
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Optional, List
+import orjson
 from fastapi import APIRouter, HTTPException
 
 from models.schemas import (
@@ -32,15 +33,13 @@ DATA_DIR = Path(__file__).parent.parent.parent / "data"
 def load_schedule_data() -> dict:
     """Load doctor schedule from JSON file."""
     schedule_path = DATA_DIR / "doctor_schedule.json"
-    with open(schedule_path, "r") as f:
-        return json.load(f)
+    return orjson.loads(schedule_path.read_bytes())
 
 
 def save_schedule_data(data: dict) -> None:
     """Save updated schedule data to JSON file."""
     schedule_path = DATA_DIR / "doctor_schedule.json"
-    with open(schedule_path, "w") as f:
-        json.dump(data, f, indent=2)
+    schedule_path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
 
 
 def generate_confirmation_code() -> str:
@@ -98,10 +97,14 @@ def is_in_lunch_break(time_str: str, lunch_start: Optional[str], lunch_end: Opti
 def get_available_slots(
     date_str: str,
     appointment_type: AppointmentType,
-    schedule_data: dict
+    schedule_data: dict,
+    existing_appointments: Optional[List[dict]] = None
 ) -> List[TimeSlot]:
     """
     Calculate available time slots for a given date and appointment type.
+    
+    existing_appointments may be passed when the caller has already picked out
+    the appointments on date_str, to avoid rescanning the full list.
     """
     # Check if date is valid
     try:
@@ -141,10 +144,11 @@ def get_available_slots(
     current_time = start_time
     
     # Get existing appointments for this date
-    existing_appointments = [
-        appt for appt in schedule_data.get("existing_appointments", [])
-        if appt["date"] == date_str
-    ]
+    if existing_appointments is None:
+        existing_appointments = [
+            appt for appt in schedule_data.get("existing_appointments", [])
+            if appt["date"] == date_str
+        ]
     
     while parse_time(current_time) < parse_time(end_time):
         slot_end = add_minutes(current_time, duration)
@@ -433,13 +437,20 @@ async def get_available_dates(days_ahead: int = 14, appointment_type: str = "con
     schedule_data = load_schedule_data()
     available_dates = []
     
+    # Group appointments by date once rather than rescanning them for every day
+    appointments_by_date = defaultdict(list)
+    for appt in schedule_data.get("existing_appointments", []):
+        appointments_by_date[appt["date"]].append(appt)
+    
     today = datetime.now()
     
     for i in range(days_ahead):
         check_date = today + timedelta(days=i)
         date_str = check_date.strftime("%Y-%m-%d")
         
-        slots = get_available_slots(date_str, appt_type, schedule_data)
+        slots = get_available_slots(
+            date_str, appt_type, schedule_data, appointments_by_date.get(date_str, [])
+        )
         available_count = sum(1 for slot in slots if slot.available)
         
         if available_count > 0:
@@ -7,6 +7,7 @@ Calendly API Documentation: https://developer.calendly.com/api-docs
 
 import os
 import httpx
+import orjson
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, HTTPException, Depends
@@ -17,6 +18,7 @@ from models.schemas import (
     APPOINTMENT_DURATIONS,
     TimeSlot,
 )
+from tools.http_client import create_http_client
 
 router = APIRouter(prefix="/api/calendly-live", tags=["calendly-live"])
 
@@ -45,30 +47,43 @@ class CalendlyClient:
     def __init__(self):
         self.base_url = CALENDLY_API_BASE
         self.api_key = CALENDLY_API_KEY
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    def _client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = create_http_client()
+        return self._http_client
+    
+    async def close(self) -> None:
+        """Close the shared HTTP client."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
         
     async def _request(self, method: str, endpoint: str, **kwargs) -> Dict:
         """Make an authenticated request to Calendly API."""
-        async with httpx.AsyncClient() as client:
-            response = await client.request(
-                method,
-                f"{self.base_url}{endpoint}",
-                headers=get_headers(),
-                **kwargs
+        client = self._client()
+        response = await client.request(
+            method,
+            f"{self.base_url}{endpoint}",
+            headers=get_headers(),
+            **kwargs
+        )
+        
+        if response.status_code == 401:
+            raise HTTPException(status_code=401, detail="Invalid Calendly API key")
+        elif response.status_code == 403:
+            raise HTTPException(status_code=403, detail="Forbidden - check API permissions")
+        elif response.status_code == 404:
+            raise HTTPException(status_code=404, detail="Resource not found")
+        elif response.status_code >= 400:
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"Calendly API error: {response.text}"
             )
-            
-            if response.status_code == 401:
-                raise HTTPException(status_code=401, detail="Invalid Calendly API key")
-            elif response.status_code == 403:
-                raise HTTPException(status_code=403, detail="Forbidden - check API permissions")
-            elif response.status_code == 404:
-                raise HTTPException(status_code=404, detail="Resource not found")
-            elif response.status_code >= 400:
-                raise HTTPException(
-                    status_code=response.status_code,
-                    detail=f"Calendly API error: {response.text}"
-                )
-            
-            return response.json()
+        
+        return orjson.loads(response.content)
     
     async def get_current_user(self) -> Dict:
         """Get the current authenticated user."""
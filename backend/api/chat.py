@@ -3,9 +3,11 @@ Chat API endpoint for the Medical Appointment Scheduling Agent.
 """
 
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Optional, List, Dict
 import asyncio
+import orjson
 
 from models.schemas import ChatRequest, ChatResponse
 from agent.scheduling_agent import SchedulingAgent
@@ -24,6 +26,12 @@ def get_agent() -> SchedulingAgent:
     return _agent
 
 
+async def close_agent() -> None:
+    """Close the scheduling agent's HTTP connections if it was created."""
+    if _agent is not None:
+        await _agent.close()
+
+
 class MessageRequest(BaseModel):
     """Request model for sending a message."""
     message: str
@@ -76,6 +84,33 @@ async def send_message(request: MessageRequest):
         )
 
 
+@router.post("/message/stream")
+async def stream_message(request: MessageRequest):
+    """
+    Send a message and receive the reply as Server-Sent Events.
+    
+    Each event is a JSON object: "token" events carry chunks of the reply as Gemini
+    generates them, and a final "done" event carries the same fields as /message.
+    
+    - **message**: The user's message
+    - **session_id**: Optional session ID for conversation continuity
+    """
+    agent = get_agent()
+    
+    async def events() -> AsyncIterator[bytes]:
+        try:
+            async for event in agent.process_message_stream(
+                message=request.message,
+                session_id=request.session_id
+            ):
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            error = {"type": "error", "detail": f"Error processing message: {str(e)}"}
+            yield b"data: " + orjson.dumps(error) + b"\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
 @router.get("/session/{session_id}", response_model=ConversationHistoryResponse)
 async def get_session(session_id: str):
     """
@@ -85,14 +120,14 @@ async def get_session(session_id: str):
     """
     agent = get_agent()
     
-    if session_id not in agent.sessions:
+    # Single lookup: sessions expire, so a membership check can go stale
+    state = await agent.load_session(session_id)
+    if state is None:
         raise HTTPException(
             status_code=404,
             detail="Session not found"
         )
     
-    state = agent.sessions[session_id]
-    
     return ConversationHistoryResponse(
         session_id=session_id,
         messages=[
@@ -101,7 +136,7 @@ async def get_session(session_id: str):
                 "content": msg.content,
                 "timestamp": msg.timestamp.isoformat() if msg.timestamp else None
             }
-            for msg in state.messages
+            for msg in state.to_chat_messages()
         ],
         current_phase=state.phase.value
     )
@@ -116,8 +151,7 @@ async def delete_session(session_id: str):
     """
     agent = get_agent()
     
-    if session_id in agent.sessions:
-        del agent.sessions[session_id]
+    if await agent.delete_session(session_id):
         return {"status": "deleted", "session_id": session_id}
     
     raise HTTPException(
@@ -133,7 +167,7 @@ async def reset_all_sessions():
     Use with caution - this clears all active sessions.
     """
     agent = get_agent()
-    agent.sessions.clear()
+    await agent.clear_sessions()
     return {"status": "all sessions cleared"}
 
 
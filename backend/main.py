@@ -13,6 +13,7 @@ from contextlib import asynccontextmanager
 from pathlib import Path
 
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 
@@ -28,8 +29,8 @@ else:
 
 # Import routers
 from api.calendly_integration import router as calendly_router
-from api.calendly_real import router as calendly_real_router
-from api.chat import router as chat_router
+from api.calendly_real import calendly_client, router as calendly_real_router
+from api.chat import close_agent, router as chat_router
 from rag.faq_rag import get_faq_rag
 
 
@@ -56,6 +57,8 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("👋 Shutting down...")
+    await close_agent()
+    await calendly_client.close()
 
 
 # Create FastAPI application
@@ -77,6 +80,7 @@ app = FastAPI(
     """,
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Configure CORS
@@ -147,5 +151,6 @@ if __name__ == "__main__":
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=debug
+        reload=debug,
+        log_level="info" if debug else "warning"
     )
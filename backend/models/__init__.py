@@ -14,6 +14,8 @@ from .schemas import (
     ChatResponse,
     ConversationPhase,
     ConversationState,
+    MAX_CONVERSATION_MESSAGES,
+    CONTACT_FIELDS,
     FAQQuery,
     FAQResult,
     WorkingHours,
@@ -36,6 +38,8 @@ __all__ = [
     "ChatResponse",
     "ConversationPhase",
     "ConversationState",
+    "MAX_CONVERSATION_MESSAGES",
+    "CONTACT_FIELDS",
     "FAQQuery",
     "FAQResult",
     "WorkingHours",
@@ -2,8 +2,9 @@
 Pydantic models and schemas for the Medical Appointment Scheduling Agent.
 """
 
+from collections import deque
 from datetime import datetime, date, time
-from typing import Optional, List, Literal
+from typing import Deque, Optional, List, Literal, Set, Tuple
 from pydantic import BaseModel, EmailStr, Field
 from enum import Enum
 
@@ -121,6 +122,13 @@ class ConversationPhase(str, Enum):
     FAQ = "faq"
 
 
+# Only the most recent turns are kept on a conversation
+MAX_CONVERSATION_MESSAGES = 20
+
+# Patient details required before an appointment can be booked
+CONTACT_FIELDS = ("name", "phone", "email")
+
+
 class ConversationState(BaseModel):
     """Tracks the state of a scheduling conversation."""
     session_id: str
@@ -130,8 +138,12 @@ class ConversationState(BaseModel):
     preferred_time_of_day: Optional[str] = None  # morning, afternoon, evening
     selected_slot: Optional[dict] = None
     patient_info: Optional[dict] = None
+    missing_contact_fields: Set[str] = Field(default_factory=lambda: set(CONTACT_FIELDS))
     reason_for_visit: Optional[str] = None
-    messages: List[ChatMessage] = []
+    # (role, content, timestamp) tuples; ChatMessage models are built only for API output
+    messages: Deque[Tuple[str, str, datetime]] = Field(
+        default_factory=lambda: deque(maxlen=MAX_CONVERSATION_MESSAGES)
+    )
     pending_faq: bool = False  # True if we need to return to scheduling after FAQ
     available_slots: Optional[List[dict]] = None  # Store available slots for reference
     scheduling_url: Optional[str] = None  # For real Calendly bookings
@@ -141,6 +153,20 @@ class ConversationState(BaseModel):
     class Config:
         # Allow setting extra attributes dynamically
         extra = "allow"
+    
+    def set_patient_field(self, field: str, value: str) -> None:
+        """Record a patient detail and mark it as no longer missing."""
+        if self.patient_info is None:
+            self.patient_info = {}
+        self.patient_info[field] = value
+        self.missing_contact_fields.discard(field)
+    
+    def to_chat_messages(self) -> List[ChatMessage]:
+        """Build ChatMessage models from the stored turns."""
+        return [
+            ChatMessage(role=role, content=content, timestamp=timestamp)
+            for role, content, timestamp in self.messages
+        ]
 
 
 # RAG Models
@@ -1,12 +1,15 @@
-from .faq_rag import FAQRAG, get_faq_rag
+from .faq_rag import FAQRAG, get_faq_rag, is_faq_question
 from .vector_store import VectorStore, initialize_vector_store
 from .embeddings import EmbeddingProvider, get_embedding_function
+from .semantic_cache import SemanticCache
 
 __all__ = [
     "FAQRAG",
     "get_faq_rag",
+    "is_faq_question",
     "VectorStore",
     "initialize_vector_store",
     "EmbeddingProvider",
     "get_embedding_function",
+    "SemanticCache",
 ]
@@ -6,9 +6,81 @@ from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 import json
 
+import ahocorasick
+
+from .semantic_cache import SemanticCache
 from .vector_store import VectorStore, initialize_vector_store
 
 
+# Keywords that suggest FAQ intent
+FAQ_KEYWORDS = (
+    "where", "location", "address", "parking", "directions",
+    "hours", "open", "close", "when",
+    "insurance", "accept", "payment", "pay", "cost", "price", "billing",
+    "bring", "documents", "prepare", "first visit",
+    "cancel", "cancellation", "policy", "policies",
+    "covid", "mask", "protocol",
+    "late", "arrive", "early",
+    "telehealth", "virtual", "video",
+    "contact", "phone", "email", "call",
+)
+
+# Keywords that suggest scheduling intent
+SCHEDULING_KEYWORDS = (
+    "book", "schedule", "appointment", "see the doctor",
+    "available", "slot", "time", "tomorrow", "today",
+    "reschedule", "change my appointment",
+)
+
+# Question phrasings that each count double toward FAQ intent
+QUESTION_PATTERNS = (
+    "do you", "what is", "what are", "how do", "how can", "where is", "where are", "is there", "can i",
+)
+
+
+def _build_intent_automaton() -> ahocorasick.Automaton:
+    """Build one automaton mapping each keyword to its (FAQ, scheduling) score weights."""
+    weights: Dict[str, Tuple[int, int]] = {}
+    for keywords, faq_weight, scheduling_weight in (
+        (FAQ_KEYWORDS, 1, 0),
+        (SCHEDULING_KEYWORDS, 0, 1),
+        (QUESTION_PATTERNS, 2, 0),
+    ):
+        for keyword in keywords:
+            faq, scheduling = weights.get(keyword, (0, 0))
+            weights[keyword] = (faq + faq_weight, scheduling + scheduling_weight)
+    
+    automaton = ahocorasick.Automaton()
+    for keyword, weight in weights.items():
+        automaton.add_word(keyword, (keyword, weight))
+    automaton.make_automaton()
+    return automaton
+
+
+_INTENT_AUTOMATON = _build_intent_automaton()
+
+
+def is_faq_question(query: str) -> bool:
+    """
+    Determine if a query is likely an FAQ question vs. a scheduling request.
+    
+    Keyword-only, so routing a message doesn't load the vector store.
+    
+    Args:
+        query: The user's query
+        
+    Returns:
+        True if likely an FAQ question, False otherwise
+    """
+    # One pass finds every keyword; each counts once however often it
+    # appears, and question phrasings like "do you" count double
+    matched = {value for _end, value in _INTENT_AUTOMATON.iter(query.lower())}
+    faq_score = sum(faq for _keyword, (faq, _scheduling) in matched)
+    scheduling_score = sum(scheduling for _keyword, (_faq, scheduling) in matched)
+    
+    return faq_score > scheduling_score
+
+
 class FAQRAG:
     """
     RAG system for retrieving and answering clinic FAQs.
@@ -23,6 +95,8 @@ class FAQRAG:
         """
         self.vector_store = initialize_vector_store(persist_directory)
         self.confidence_threshold = 0.5  # Minimum similarity for a valid answer
+        # Retrieved answers for near-identical questions, keyed by query embedding
+        self.answer_cache = SemanticCache(threshold=0.97, capacity=256, ttl_seconds=3600)
         
         # Load clinic data for additional context
         data_dir = Path(__file__).parent.parent.parent / "data"
@@ -32,53 +106,27 @@ class FAQRAG:
             self.clinic_data = json.load(f)
     
     def is_faq_question(self, query: str) -> bool:
+        """Determine if a query is likely an FAQ question; see the module-level is_faq_question."""
+        return is_faq_question(query)
+    
+    def embed(self, text: str) -> List[float]:
         """
-        Determine if a query is likely an FAQ question vs. a scheduling request.
+        Embed a query with the vector store's embedding model.
         
         Args:
-            query: The user's query
+            text: The text to embed
             
         Returns:
-            True if likely an FAQ question, False otherwise
+            Embedding vector
         """
-        # Keywords that suggest FAQ intent
-        faq_keywords = [
-            "where", "location", "address", "parking", "directions",
-            "hours", "open", "close", "when",
-            "insurance", "accept", "payment", "pay", "cost", "price", "billing",
-            "bring", "documents", "prepare", "first visit",
-            "cancel", "cancellation", "policy", "policies",
-            "covid", "mask", "protocol",
-            "late", "arrive", "early",
-            "telehealth", "virtual", "video",
-            "contact", "phone", "email", "call"
-        ]
-        
-        # Keywords that suggest scheduling intent
-        scheduling_keywords = [
-            "book", "schedule", "appointment", "see the doctor",
-            "available", "slot", "time", "tomorrow", "today",
-            "reschedule", "change my appointment"
-        ]
-        
-        query_lower = query.lower()
-        
-        faq_score = sum(1 for kw in faq_keywords if kw in query_lower)
-        scheduling_score = sum(1 for kw in scheduling_keywords if kw in query_lower)
-        
-        # If the query contains "do you" or "what is" or "how", it's likely FAQ
-        question_patterns = ["do you", "what is", "what are", "how do", "how can", "where is", "where are", "is there", "can i"]
-        for pattern in question_patterns:
-            if pattern in query_lower:
-                faq_score += 2
-        
-        return faq_score > scheduling_score
+        return self.vector_store.embed([text])[0]
     
     def retrieve(
         self,
         query: str,
         n_results: int = 3,
-        category: Optional[str] = None
+        category: Optional[str] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> List[Dict]:
         """
         Retrieve relevant FAQ entries for a query.
@@ -87,6 +135,7 @@ class FAQRAG:
             query: The user's question
             n_results: Number of results to retrieve
             category: Optional category filter
+            query_embedding: Precomputed embedding of the query, if available
             
         Returns:
             List of relevant FAQ entries with metadata
@@ -96,7 +145,8 @@ class FAQRAG:
         results = self.vector_store.query(
             query_text=query,
             n_results=n_results,
-            where=where_filter
+            where=where_filter,
+            query_embedding=query_embedding
         )
         
         retrieved = []
@@ -118,18 +168,23 @@ class FAQRAG:
         
         return retrieved
     
-    def get_answer(self, query: str) -> Tuple[str, float, List[Dict]]:
+    def get_answer(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]] = None
+    ) -> Tuple[str, float, List[Dict]]:
         """
         Get an answer for a FAQ query.
         
         Args:
             query: The user's question
+            query_embedding: Precomputed embedding of the query, if available
             
         Returns:
             Tuple of (answer, confidence, sources)
         """
         # Retrieve relevant documents
-        results = self.retrieve(query, n_results=3)
+        results = self.retrieve(query, n_results=3, query_embedding=query_embedding)
         
         if not results:
             return self._get_fallback_answer(), 0.0, []
@@ -173,17 +228,31 @@ class FAQRAG:
         """
         return self.clinic_data.get(info_type)
     
-    def format_answer_for_chat(self, query: str) -> str:
+    def format_answer_for_chat(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]] = None
+    ) -> str:
         """
         Format an FAQ answer for chat response.
         
         Args:
             query: The user's question
+            query_embedding: Precomputed embedding of the query; when given, a
+                near-identical earlier question's answer is reused
             
         Returns:
             Formatted answer string
         """
-        answer, confidence, sources = self.get_answer(query)
+        if query_embedding is not None:
+            cached = self.answer_cache.get(query_embedding)
+            if cached is not None:
+                return cached
+        
+        answer, confidence, sources = self.get_answer(query, query_embedding=query_embedding)
+        
+        if query_embedding is not None:
+            self.answer_cache.put(query_embedding, answer)
         
         # If confidence is very high, just return the answer
         if confidence > 0.8:
@@ -0,0 +1,113 @@
+"""
+Approximate (semantic) cache keyed by text embeddings.
+Lets near-duplicate questions reuse an earlier answer instead of another LLM call.
+"""
+
+import time
+from typing import Any, List, Optional, Sequence
+
+import numpy as np
+
+
+def normalize_embedding(embedding: Sequence[float]) -> np.ndarray:
+    """L2-normalize an embedding so cosine similarity becomes a dot product."""
+    vector = np.asarray(embedding, dtype=np.float32).ravel()
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticCache:
+    """
+    Cache whose lookups hit when a stored key is close enough in embedding space.
+    Entries expire after a TTL and the least recently used entry is evicted at capacity.
+    """
+    
+    def __init__(
+        self,
+        threshold: float = 0.92,
+        capacity: int = 256,
+        ttl_seconds: float = 3600.0
+    ):
+        """
+        Initialize the semantic cache.
+        
+        Args:
+            threshold: Minimum cosine similarity for a cache hit
+            capacity: Maximum number of cached entries
+            ttl_seconds: Lifetime of an entry in seconds
+        """
+        self.threshold = threshold
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        
+        self._keys: Optional[np.ndarray] = None  # One normalized embedding per row
+        self._values: List[Any] = []
+        self._expires_at: List[float] = []
+        self._last_used: List[int] = []
+        self._clock = 0
+    
+    def get(self, embedding: Sequence[float]) -> Optional[Any]:
+        """
+        Look up the value stored for the closest cached embedding.
+        
+        Args:
+            embedding: Embedding of the query
+            
+        Returns:
+            The cached value, or None if nothing is within the threshold
+        """
+        self._evict_expired()
+        if not self._values:
+            return None
+        
+        similarities = self._keys @ normalize_embedding(embedding)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        
+        self._clock += 1
+        self._last_used[best] = self._clock
+        return self._values[best]
+    
+    def put(self, embedding: Sequence[float], value: Any) -> None:
+        """
+        Store a value under an embedding.
+        
+        Args:
+            embedding: Embedding of the query
+            value: Value to cache
+        """
+        self._evict_expired()
+        if len(self._values) >= self.capacity:
+            self._remove(int(np.argmin(self._last_used)))
+        
+        key = normalize_embedding(embedding)[np.newaxis, :]
+        self._keys = key if self._keys is None else np.vstack([self._keys, key])
+        self._values.append(value)
+        self._expires_at.append(time.monotonic() + self.ttl_seconds)
+        self._clock += 1
+        self._last_used.append(self._clock)
+    
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        self._keys = None
+        self._values.clear()
+        self._expires_at.clear()
+        self._last_used.clear()
+    
+    def __len__(self) -> int:
+        return len(self._values)
+    
+    def _evict_expired(self) -> None:
+        """Drop entries whose TTL has passed."""
+        now = time.monotonic()
+        for index in range(len(self._values) - 1, -1, -1):
+            if self._expires_at[index] <= now:
+                self._remove(index)
+    
+    def _remove(self, index: int) -> None:
+        """Remove the entry at a given position."""
+        del self._values[index]
+        del self._expires_at[index]
+        del self._last_used[index]
+        self._keys = np.delete(self._keys, index, axis=0) if self._values else None
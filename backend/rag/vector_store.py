@@ -4,6 +4,7 @@ Vector store implementation using ChromaDB for FAQ retrieval.
 
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils import embedding_functions
 from pathlib import Path
 from typing import List, Dict, Optional
 import json
@@ -27,6 +28,7 @@ class VectorStore:
         
         self.collection_name = "clinic_faqs"
         self.collection = None
+        self._embedding_function = None
     
     def get_or_create_collection(self):
         """Get existing collection or create a new one."""
@@ -64,7 +66,8 @@ class VectorStore:
         self,
         query_text: str,
         n_results: int = 3,
-        where: Optional[Dict] = None
+        where: Optional[Dict] = None,
+        query_embedding: Optional[List[float]] = None
     ) -> Dict:
         """
         Query the vector store for similar documents.
@@ -73,6 +76,7 @@ class VectorStore:
             query_text: The query text
             n_results: Number of results to return
             where: Optional filter conditions
+            query_embedding: Precomputed embedding of query_text, skips re-embedding
             
         Returns:
             Dictionary with documents, metadatas, distances, and ids
@@ -80,11 +84,18 @@ class VectorStore:
         if self.collection is None:
             self.get_or_create_collection()
         
-        results = self.collection.query(
-            query_texts=[query_text],
-            n_results=n_results,
-            where=where
-        )
+        if query_embedding is not None:
+            results = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=where
+            )
+        else:
+            results = self.collection.query(
+                query_texts=[query_text],
+                n_results=n_results,
+                where=where
+            )
         
         return {
             "documents": results["documents"][0] if results["documents"] else [],
@@ -93,6 +104,20 @@ class VectorStore:
             "ids": results["ids"][0] if results["ids"] else []
         }
     
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed texts with the same model the collection uses (all-MiniLM-L6-v2).
+        
+        Args:
+            texts: Texts to embed
+            
+        Returns:
+            One embedding per text
+        """
+        if self._embedding_function is None:
+            self._embedding_function = embedding_functions.DefaultEmbeddingFunction()
+        return self._embedding_function(texts)
+    
     def delete_collection(self) -> None:
         """Delete the collection."""
         try:
@@ -174,13 +199,13 @@ def initialize_vector_store(persist_directory: str = "./data/vectordb") -> Vecto
     ids.append("clinic-info")
     
     # Hours document
-    hours_doc = "Clinic Hours:\n"
+    hours_lines = ["Clinic Hours:\n"]
     for day, times in hours.items():
         if times.get("closed"):
-            hours_doc += f"{day.capitalize()}: Closed\n"
+            hours_lines.append(f"{day.capitalize()}: Closed\n")
         elif times.get("open"):
-            hours_doc += f"{day.capitalize()}: {times['open']} - {times['close']}\n"
-    documents.append(hours_doc)
+            hours_lines.append(f"{day.capitalize()}: {times['open']} - {times['close']}\n")
+    documents.append("".join(hours_lines))
     metadatas.append({"category": "Hours", "type": "structured"})
     ids.append("clinic-hours")
     
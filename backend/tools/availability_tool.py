@@ -2,11 +2,65 @@
 Availability tool for checking doctor's available time slots.
 """
 
+import asyncio
 import os
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
+import ahocorasick
 import httpx
+import orjson
+from cachetools import TTLCache
 from models.schemas import AppointmentType, APPOINTMENT_DURATIONS
+from tools.http_client import create_http_client
+
+
+# Availability changes on the order of minutes, so briefly reuse responses
+AVAILABILITY_CACHE_TTL_SECONDS = 30
+
+# Start-hour range [start, end) for each time-of-day preference
+TIME_OF_DAY_HOURS = {
+    "morning": (6, 12),
+    "afternoon": (12, 17),
+    "evening": (17, 21),
+}
+
+# Day-of-week words (and plurals, "mondays") -> datetime.weekday() index
+_WEEKDAY_NUMBERS = {
+    name + suffix: number
+    for number, name in enumerate(
+        ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+    )
+    for suffix in ("", "s")
+}
+_WORD_RE = re.compile(r"[a-z]+")
+
+# Time-of-day preference keywords, in priority order when a message has several
+TIME_PREFERENCE_KEYWORDS = (
+    ("morning", ("morning", "am", "early")),
+    ("afternoon", ("afternoon", "lunch", "midday")),
+    ("evening", ("evening", "pm", "late", "after work", "after 5")),
+)
+
+
+def _build_time_preference_automaton() -> ahocorasick.Automaton:
+    """Build one automaton mapping each keyword to its (priority, preference)."""
+    automaton = ahocorasick.Automaton()
+    for priority, (preference, keywords) in enumerate(TIME_PREFERENCE_KEYWORDS):
+        for keyword in keywords:
+            automaton.add_word(keyword, (priority, preference))
+    automaton.make_automaton()
+    return automaton
+
+
+_TIME_PREFERENCE_AUTOMATON = _build_time_preference_automaton()
+
+
+def _start_hour(slot: Dict) -> int:
+    """Hour a slot starts at, from its "HH:MM" start_time (0 if missing)."""
+    start_time = slot.get("start_time") or ""
+    return int(start_time.split(":")[0]) if start_time else 0
 
 
 class AvailabilityTool:
@@ -24,28 +78,95 @@ class AvailabilityTool:
         self.use_real_calendly = os.getenv("USE_REAL_CALENDLY", "false").lower() == "true"
         self.calendly_endpoint = "/api/calendly-live" if self.use_real_calendly else "/api/calendly"
         self._event_type_uri = None  # Cache event type URI for real Calendly
+        # Successful responses keyed by (date, appointment_type) / (days_ahead, appointment_type)
+        self._slots_cache: TTLCache = TTLCache(maxsize=256, ttl=AVAILABILITY_CACHE_TTL_SECONDS)
+        self._dates_cache: TTLCache = TTLCache(maxsize=64, ttl=AVAILABILITY_CACHE_TTL_SECONDS)
+        self._in_flight: Dict[Tuple, asyncio.Future] = {}  # Requests currently being fetched
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    def _client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = create_http_client()
+        return self._http_client
+    
+    async def close(self) -> None:
+        """Close the shared HTTP client."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+    
+    async def _cached_fetch(
+        self,
+        cache: TTLCache,
+        key: Tuple,
+        fetch: Callable[[], Awaitable[Dict]]
+    ) -> Dict:
+        """
+        Return a cached response, sharing one in-flight request per key.
+        
+        Concurrent callers asking for the same key while it is being fetched
+        await the same request instead of issuing their own.
+        
+        Args:
+            cache: Cache holding successful responses
+            key: Cache key
+            fetch: Coroutine factory performing the request
+            
+        Returns:
+            The response dictionary
+        """
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+        
+        flight_key = (id(cache), key)
+        task = self._in_flight.get(flight_key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[flight_key] = task
+            task.add_done_callback(lambda _task: self._in_flight.pop(flight_key, None))
+        
+        result = await asyncio.shield(task)
+        if result.get("success"):
+            cache[key] = result
+        return result
+    
+    def invalidate(self, date: str) -> None:
+        """
+        Drop cached availability affected by a booking on a date.
+        
+        Every appointment type shares the doctor's time, so the date's slots are
+        dropped for all of them.
+        
+        Args:
+            date: Date in YYYY-MM-DD format
+        """
+        for key in [key for key in self._slots_cache if key[0] == date]:
+            self._slots_cache.pop(key, None)
+        self._dates_cache.clear()
     
     async def _get_default_event_type_uri(self) -> str:
         """Get the default event type URI from real Calendly."""
         if self._event_type_uri:
             return self._event_type_uri
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.api_base_url}/api/calendly-live/event-types"
-            )
-            if response.status_code == 200:
-                data = response.json()
-                event_types = data.get("event_types", [])
-                if event_types:
-                    # Use the first active event type
-                    for et in event_types:
-                        if et.get("active"):
-                            self._event_type_uri = et.get("uri")
-                            return self._event_type_uri
-                    # Fallback to first event type
-                    self._event_type_uri = event_types[0].get("uri")
-                    return self._event_type_uri
+        client = self._client()
+        response = await client.get(
+            f"{self.api_base_url}/api/calendly-live/event-types"
+        )
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            event_types = data.get("event_types", [])
+            if event_types:
+                # Use the first active event type
+                for et in event_types:
+                    if et.get("active"):
+                        self._event_type_uri = et.get("uri")
+                        return self._event_type_uri
+                # Fallback to first event type
+                self._event_type_uri = event_types[0].get("uri")
+                return self._event_type_uri
         return ""
     
     async def get_available_slots(
@@ -63,76 +184,87 @@ class AvailabilityTool:
         Returns:
             Dictionary with available slots and metadata
         """
+        return await self._cached_fetch(
+            self._slots_cache,
+            (date, appointment_type),
+            lambda: self._fetch_available_slots(date, appointment_type)
+        )
+    
+    async def _fetch_available_slots(self, date: str, appointment_type: str) -> Dict:
+        """Request available slots from the Calendly API."""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                if self.use_real_calendly:
-                    # Get event type URI first
-                    event_type_uri = await self._get_default_event_type_uri()
-                    if not event_type_uri:
-                        return {
-                            "success": False,
-                            "error": "No event types configured in Calendly"
-                        }
-                    
-                    # Use real Calendly API
-                    url = f"{self.api_base_url}/api/calendly-live/availability"
-                    params = {"event_type_uri": event_type_uri, "date": date, "days": 1}
-                    response = await client.get(url, params=params)
+            client = self._client()
+            if self.use_real_calendly:
+                # Get event type URI first
+                event_type_uri = await self._get_default_event_type_uri()
+                if not event_type_uri:
+                    return {
+                        "success": False,
+                        "error": "No event types configured in Calendly"
+                    }
+                
+                # Use real Calendly API
+                url = f"{self.api_base_url}/api/calendly-live/availability"
+                params = {"event_type_uri": event_type_uri, "date": date, "days": 1}
+                response = await client.get(url, params=params, timeout=30.0)
+                
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    # Convert real Calendly format to our expected format
+                    availability = data.get("availability", {})
+                    available_slots = []
+                    for date_key, slots in availability.items():
+                        for slot in slots:
+                            available_slots.append({
+                                "start_time": slot.get("start_time"),
+                                "end_time": "",  # Calculate if needed
+                                "available": True,
+                                "scheduling_url": slot.get("scheduling_url")
+                            })
                     
-                    if response.status_code == 200:
-                        data = response.json()
-                        # Convert real Calendly format to our expected format
-                        availability = data.get("availability", {})
-                        available_slots = []
-                        for date_key, slots in availability.items():
-                            for slot in slots:
-                                available_slots.append({
-                                    "start_time": slot.get("start_time"),
-                                    "end_time": "",  # Calculate if needed
-                                    "available": True,
-                                    "scheduling_url": slot.get("scheduling_url")
-                                })
-                        
-                        return {
-                            "success": True,
-                            "date": date,
-                            "appointment_type": appointment_type,
-                            "duration_minutes": 30,  # Default for real Calendly
-                            "available_slots": available_slots,
-                            "total_available": len(available_slots)
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": response.json().get("detail", "Failed to fetch availability")
-                        }
+                    return {
+                        "success": True,
+                        "date": date,
+                        "appointment_type": appointment_type,
+                        "duration_minutes": 30,  # Default for real Calendly
+                        "available_slots": available_slots,
+                        "start_hours": [_start_hour(slot) for slot in available_slots],
+                        "total_available": len(available_slots)
+                    }
                 else:
-                    # Use mock Calendly API
-                    response = await client.get(
-                        f"{self.api_base_url}/api/calendly/availability",
-                        params={"date": date, "appointment_type": appointment_type}
-                    )
-                
-                    if response.status_code == 200:
-                        data = response.json()
-                        # Filter to only available slots
-                        available_only = [
-                            slot for slot in data.get("available_slots", [])
-                            if slot.get("available", False)
-                        ]
-                        return {
-                            "success": True,
-                            "date": data.get("date"),
-                            "appointment_type": data.get("appointment_type"),
-                            "duration_minutes": data.get("duration_minutes"),
-                            "available_slots": available_only,
-                            "total_available": len(available_only)
-                        }
-                    else:
-                        return {
-                            "success": False,
-                            "error": response.json().get("detail", "Failed to fetch availability")
-                        }
+                    return {
+                        "success": False,
+                        "error": orjson.loads(response.content).get("detail", "Failed to fetch availability")
+                    }
+            else:
+                # Use mock Calendly API
+                response = await client.get(
+                    f"{self.api_base_url}/api/calendly/availability",
+                    params={"date": date, "appointment_type": appointment_type},
+                    timeout=30.0
+                )
+            
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    # Filter to only available slots
+                    available_only = [
+                        slot for slot in data.get("available_slots", [])
+                        if slot.get("available", False)
+                    ]
+                    return {
+                        "success": True,
+                        "date": data.get("date"),
+                        "appointment_type": data.get("appointment_type"),
+                        "duration_minutes": data.get("duration_minutes"),
+                        "available_slots": available_only,
+                        "start_hours": [_start_hour(slot) for slot in available_only],
+                        "total_available": len(available_only)
+                    }
+                else:
+                    return {
+                        "success": False,
+                        "error": orjson.loads(response.content).get("detail", "Failed to fetch availability")
+                    }
         except Exception as e:
             return {
                 "success": False,
@@ -152,29 +284,46 @@ class AvailabilityTool:
             appointment_type: Type of appointment
             
         Returns:
-            Dictionary with available dates
+            Dictionary with available dates, plus "display_lines" listing each
+            one as e.g. "- Monday, 2024-01-15 (8 slots available)"
         """
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.api_base_url}/api/calendly/schedule/dates",
-                params={"days_ahead": days_ahead, "appointment_type": appointment_type}
-            )
-            
-            if response.status_code == 200:
-                return {
-                    "success": True,
-                    **response.json()
-                }
-            else:
-                return {
-                    "success": False,
-                    "error": response.json().get("detail", "Failed to fetch available dates")
-                }
+        return await self._cached_fetch(
+            self._dates_cache,
+            (days_ahead, appointment_type),
+            lambda: self._fetch_available_dates(days_ahead, appointment_type)
+        )
+    
+    async def _fetch_available_dates(self, days_ahead: int, appointment_type: str) -> Dict:
+        """Request dates with availability from the Calendly API."""
+        client = self._client()
+        response = await client.get(
+            f"{self.api_base_url}/api/calendly/schedule/dates",
+            params={"days_ahead": days_ahead, "appointment_type": appointment_type}
+        )
+        
+        if response.status_code == 200:
+            data = orjson.loads(response.content)
+            # Formatted once here, so cached results are listed without reformatting
+            data["display_lines"] = [
+                f"- {d['day_name']}, {d['date']} ({d['available_slots']} slots available)"
+                for d in data.get("available_dates", [])
+            ]
+            return {
+                "success": True,
+                **data
+            }
+        else:
+            return {
+                "success": False,
+                "error": orjson.loads(response.content).get("detail", "Failed to fetch available dates")
+            }
     
     def get_slots_for_time_preference(
         self,
         available_slots: List[Dict],
-        preference: str
+        preference: str,
+        limit: Optional[int] = None,
+        start_hours: Optional[List[int]] = None
     ) -> List[Dict]:
         """
         Filter slots based on time of day preference.
@@ -182,6 +331,9 @@ class AvailabilityTool:
         Args:
             available_slots: List of available time slots
             preference: "morning", "afternoon", "evening", or "any"
+            limit: Stop after this many matches (all matches if None)
+            start_hours: Start hour of each slot, as in get_available_slots'
+                "start_hours"; parsed from the slots if omitted
             
         Returns:
             Filtered list of slots matching the preference
@@ -189,17 +341,20 @@ class AvailabilityTool:
         if preference == "any" or not preference:
             return available_slots
         
+        hours = TIME_OF_DAY_HOURS.get(preference)
+        if hours is None:
+            return []
+        start_hour, end_hour = hours
+        
+        if start_hours is None:
+            start_hours = [_start_hour(slot) for slot in available_slots]
+        
         filtered = []
-        for slot in available_slots:
-            start_time = slot.get("start_time", "")
-            hour = int(start_time.split(":")[0]) if start_time else 0
-            
-            if preference == "morning" and 6 <= hour < 12:
-                filtered.append(slot)
-            elif preference == "afternoon" and 12 <= hour < 17:
-                filtered.append(slot)
-            elif preference == "evening" and 17 <= hour < 21:
+        for slot, hour in zip(available_slots, start_hours):
+            if start_hour <= hour < end_hour:
                 filtered.append(slot)
+                if len(filtered) == limit:
+                    break
         
         return filtered
     
@@ -225,7 +380,7 @@ class AvailabilityTool:
         
         # Format date
         try:
-            date_obj = datetime.strptime(date, "%Y-%m-%d")
+            date_obj = datetime.fromisoformat(date)
             formatted_date = date_obj.strftime("%A, %B %d")
         except ValueError:
             formatted_date = date
@@ -250,14 +405,14 @@ class AvailabilityTool:
             List of suggested alternative dates
         """
         try:
-            pref_date = datetime.strptime(preferred_date, "%Y-%m-%d")
+            pref_date = datetime.fromisoformat(preferred_date)
         except ValueError:
             return available_dates[:count]
         
         # Sort by closeness to preferred date
         def date_distance(date_info):
             try:
-                d = datetime.strptime(date_info["date"], "%Y-%m-%d")
+                d = datetime.fromisoformat(date_info["date"])
                 return abs((d - pref_date).days)
             except ValueError:
                 return float('inf')
@@ -278,37 +433,48 @@ def parse_date_reference(text: str, reference_date: Optional[datetime] = None) -
         Date string in YYYY-MM-DD format or None if unable to parse
     """
     if reference_date is None:
-        reference_date = datetime.now()
-    
+        # Relative dates only depend on the day, so phrases users repeat
+        # ("tomorrow", "next monday") are memoized per day
+        return _parse_date_reference_for_day(text, date.today())
+    return _parse_date_reference(text, reference_date)
+
+
+@lru_cache(maxsize=1024)
+def _parse_date_reference_for_day(text: str, day: date) -> Optional[str]:
+    """Parse a date reference relative to the start of a given day."""
+    return _parse_date_reference(text, datetime.combine(day, time.min))
+
+
+def _parse_date_reference(text: str, reference_date: datetime) -> Optional[str]:
+    """Parse a date reference relative to a reference datetime."""
     text_lower = text.lower().strip()
+    # Tokenized once; relative days and weekday names are looked up in the tokens
+    tokens = set(_WORD_RE.findall(text_lower))
     
     # Direct date patterns
-    if "today" in text_lower:
+    if "today" in tokens:
         return reference_date.strftime("%Y-%m-%d")
     
-    if "tomorrow" in text_lower:
+    if "tomorrow" in tokens:
         return (reference_date + timedelta(days=1)).strftime("%Y-%m-%d")
     
-    # Day of week patterns
-    days = {
-        "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
-        "friday": 4, "saturday": 5, "sunday": 6
-    }
-    
-    for day_name, day_num in days.items():
-        if day_name in text_lower:
-            current_day = reference_date.weekday()
-            days_until = (day_num - current_day) % 7
-            
-            # If "next" is mentioned, add a week
-            if "next" in text_lower and days_until == 0:
-                days_until = 7
-            elif days_until == 0 and "this" not in text_lower:
-                # If the day is today and not explicitly "this", assume next week
-                days_until = 7
-            
-            target_date = reference_date + timedelta(days=days_until)
-            return target_date.strftime("%Y-%m-%d")
+    # Day of week patterns, every day name matched in one set intersection
+    matched_days = tokens & _WEEKDAY_NUMBERS.keys()
+    if matched_days:
+        # Earliest weekday wins when several are named
+        day_num = min(_WEEKDAY_NUMBERS[day] for day in matched_days)
+        current_day = reference_date.weekday()
+        days_until = (day_num - current_day) % 7
+        
+        # If "next" is mentioned, add a week
+        if "next" in tokens and days_until == 0:
+            days_until = 7
+        elif days_until == 0 and "this" not in tokens:
+            # If the day is today and not explicitly "this", assume next week
+            days_until = 7
+        
+        target_date = reference_date + timedelta(days=days_until)
+        return target_date.strftime("%Y-%m-%d")
     
     # "Next week" pattern
     if "next week" in text_lower:
@@ -340,6 +506,7 @@ def parse_date_reference(text: str, reference_date: Optional[datetime] = None) -
     return None
 
 
+@lru_cache(maxsize=1024)
 def parse_time_preference(text: str) -> str:
     """
     Parse time of day preference from text.
@@ -350,13 +517,8 @@ def parse_time_preference(text: str) -> str:
     Returns:
         "morning", "afternoon", "evening", or "any"
     """
-    text_lower = text.lower()
-    
-    if any(word in text_lower for word in ["morning", "am", "early"]):
-        return "morning"
-    elif any(word in text_lower for word in ["afternoon", "lunch", "midday"]):
-        return "afternoon"
-    elif any(word in text_lower for word in ["evening", "pm", "late", "after work", "after 5"]):
-        return "evening"
-    
-    return "any"
+    # One scan finds every keyword; the highest-priority preference wins
+    matches = [match for _end, match in _TIME_PREFERENCE_AUTOMATON.iter(text.lower())]
+    if not matches:
+        return "any"
+    return min(matches)[1]
@@ -3,9 +3,12 @@ Booking tool for creating, canceling, and rescheduling appointments.
 """
 
 import os
+from datetime import datetime
 from typing import Dict, Optional
 import httpx
+import orjson
 from models.schemas import AppointmentType, BookingRequest, PatientInfo
+from tools.http_client import create_http_client
 
 
 class BookingTool:
@@ -22,6 +25,19 @@ class BookingTool:
         # Check if we're using real Calendly API
         self.use_real_calendly = os.getenv("USE_REAL_CALENDLY", "false").lower() == "true"
         self.calendly_endpoint = "/api/calendly-live" if self.use_real_calendly else "/api/calendly"
+        self._http_client: Optional[httpx.AsyncClient] = None
+    
+    def _client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it on first use."""
+        if self._http_client is None or self._http_client.is_closed:
+            self._http_client = create_http_client()
+        return self._http_client
+    
+    async def close(self) -> None:
+        """Close the shared HTTP client."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
     
     async def book_appointment(
         self,
@@ -51,93 +67,93 @@ class BookingTool:
             Dictionary with booking result
         """
         try:
-            async with httpx.AsyncClient() as client:
-                if self.use_real_calendly:
-                    # For real Calendly, we provide the scheduling URL
-                    # The user must click this link to complete the booking
-                    # Calendly will then send confirmation emails automatically
-                    
-                    if scheduling_url:
-                        return {
-                            "success": True,
-                            "booking_id": None,
-                            "confirmation_code": None,
-                            "status": "pending_user_action",
-                            "details": {
-                                "date": date,
-                                "time": start_time,
-                                "patient_name": patient_name,
-                                "patient_email": patient_email,
-                                "reason": reason
-                            },
-                            "scheduling_url": scheduling_url,
-                            "message": "Please click the link below to complete your booking. Calendly will send you a confirmation email once booked."
-                        }
-                    else:
-                        # Try to get a scheduling link
-                        response = await client.get(
-                            f"{self.api_base_url}/api/calendly-live/event-types"
-                        )
-                        if response.status_code == 200:
-                            data = response.json()
-                            event_types = data.get("event_types", [])
-                            if event_types:
-                                scheduling_url = event_types[0].get("scheduling_url")
-                                return {
-                                    "success": True,
-                                    "booking_id": None,
-                                    "confirmation_code": None,
-                                    "status": "pending_user_action",
-                                    "details": {
-                                        "date": date,
-                                        "time": start_time,
-                                        "patient_name": patient_name,
-                                        "patient_email": patient_email,
-                                        "reason": reason
-                                    },
-                                    "scheduling_url": scheduling_url,
-                                    "message": "Please click the link to complete your booking on Calendly."
-                                }
-                        
-                        return {
-                            "success": False,
-                            "error": "Could not get Calendly scheduling link"
-                        }
-                else:
-                    # Use mock Calendly API
-                    booking_data = {
-                        "appointment_type": appointment_type,
-                        "date": date,
-                        "start_time": start_time,
-                        "patient": {
-                            "name": patient_name,
-                            "email": patient_email,
-                            "phone": patient_phone
+            client = self._client()
+            if self.use_real_calendly:
+                # For real Calendly, we provide the scheduling URL
+                # The user must click this link to complete the booking
+                # Calendly will then send confirmation emails automatically
+                
+                if scheduling_url:
+                    return {
+                        "success": True,
+                        "booking_id": None,
+                        "confirmation_code": None,
+                        "status": "pending_user_action",
+                        "details": {
+                            "date": date,
+                            "time": start_time,
+                            "patient_name": patient_name,
+                            "patient_email": patient_email,
+                            "reason": reason
                         },
-                        "reason": reason
+                        "scheduling_url": scheduling_url,
+                        "message": "Please click the link below to complete your booking. Calendly will send you a confirmation email once booked."
                     }
-                    
-                    response = await client.post(
-                        f"{self.api_base_url}/api/calendly/book",
-                        json=booking_data
+                else:
+                    # Try to get a scheduling link
+                    response = await client.get(
+                        f"{self.api_base_url}/api/calendly-live/event-types"
                     )
-                
                     if response.status_code == 200:
-                        data = response.json()
-                        return {
-                            "success": True,
-                            "booking_id": data.get("booking_id"),
-                            "confirmation_code": data.get("confirmation_code"),
-                            "status": data.get("status"),
-                            "details": data.get("details", {}),
-                            "scheduling_url": None
-                        }
-                    else:
-                        error_detail = response.json().get("detail", "Booking failed")
-                        return {
-                            "success": False,
-                            "error": error_detail
-                        }
+                        data = orjson.loads(response.content)
+                        event_types = data.get("event_types", [])
+                        if event_types:
+                            scheduling_url = event_types[0].get("scheduling_url")
+                            return {
+                                "success": True,
+                                "booking_id": None,
+                                "confirmation_code": None,
+                                "status": "pending_user_action",
+                                "details": {
+                                    "date": date,
+                                    "time": start_time,
+                                    "patient_name": patient_name,
+                                    "patient_email": patient_email,
+                                    "reason": reason
+                                },
+                                "scheduling_url": scheduling_url,
+                                "message": "Please click the link to complete your booking on Calendly."
+                            }
+                    
+                    return {
+                        "success": False,
+                        "error": "Could not get Calendly scheduling link"
+                    }
+            else:
+                # Use mock Calendly API
+                booking_data = {
+                    "appointment_type": appointment_type,
+                    "date": date,
+                    "start_time": start_time,
+                    "patient": {
+                        "name": patient_name,
+                        "email": patient_email,
+                        "phone": patient_phone
+                    },
+                    "reason": reason
+                }
+                
+                response = await client.post(
+                    f"{self.api_base_url}/api/calendly/book",
+                    json=booking_data
+                )
+            
+                if response.status_code == 200:
+                    data = orjson.loads(response.content)
+                    return {
+                        "success": True,
+                        "booking_id": data.get("booking_id"),
+                        "confirmation_code": data.get("confirmation_code"),
+                        "status": data.get("status"),
+                        "details": data.get("details", {}),
+                        "scheduling_url": None
+                    }
+                else:
+                    error_detail = orjson.loads(response.content).get("detail", "Booking failed")
+                    return {
+                        "success": False,
+                        "error": error_detail
+                    }
         except Exception as e:
             return {
                 "success": False,
@@ -169,24 +185,24 @@ class BookingTool:
             if reason:
                 cancel_data["reason"] = reason
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_base_url}/api/calendly/cancel",
-                    json=cancel_data
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        "success": True,
-                        "message": data.get("message", "Appointment cancelled successfully")
-                    }
-                else:
-                    error_detail = response.json().get("detail", "Cancellation failed")
-                    return {
-                        "success": False,
-                        "error": error_detail
-                    }
+            client = self._client()
+            response = await client.post(
+                f"{self.api_base_url}/api/calendly/cancel",
+                json=cancel_data
+            )
+            
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                return {
+                    "success": True,
+                    "message": data.get("message", "Appointment cancelled successfully")
+                }
+            else:
+                error_detail = orjson.loads(response.content).get("detail", "Cancellation failed")
+                return {
+                    "success": False,
+                    "error": error_detail
+                }
         except Exception as e:
             return {
                 "success": False,
@@ -220,27 +236,27 @@ class BookingTool:
                 "new_start_time": new_start_time
             }
             
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"{self.api_base_url}/api/calendly/reschedule",
-                    json=reschedule_data
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return {
-                        "success": True,
-                        "message": data.get("message", "Appointment rescheduled successfully"),
-                        "new_date": data.get("new_date"),
-                        "new_start_time": data.get("new_start_time"),
-                        "new_end_time": data.get("new_end_time")
-                    }
-                else:
-                    error_detail = response.json().get("detail", "Rescheduling failed")
-                    return {
-                        "success": False,
-                        "error": error_detail
-                    }
+            client = self._client()
+            response = await client.post(
+                f"{self.api_base_url}/api/calendly/reschedule",
+                json=reschedule_data
+            )
+            
+            if response.status_code == 200:
+                data = orjson.loads(response.content)
+                return {
+                    "success": True,
+                    "message": data.get("message", "Appointment rescheduled successfully"),
+                    "new_date": data.get("new_date"),
+                    "new_start_time": data.get("new_start_time"),
+                    "new_end_time": data.get("new_end_time")
+                }
+            else:
+                error_detail = orjson.loads(response.content).get("detail", "Rescheduling failed")
+                return {
+                    "success": False,
+                    "error": error_detail
+                }
         except Exception as e:
             return {
                 "success": False,
@@ -258,21 +274,21 @@ class BookingTool:
             Dictionary with appointment details
         """
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(
-                    f"{self.api_base_url}/api/calendly/appointments/{booking_id}"
-                )
-                
-                if response.status_code == 200:
-                    return {
-                        "success": True,
-                        "appointment": response.json()
-                    }
-                else:
-                    return {
-                        "success": False,
-                        "error": "Appointment not found"
-                    }
+            client = self._client()
+            response = await client.get(
+                f"{self.api_base_url}/api/calendly/appointments/{booking_id}"
+            )
+            
+            if response.status_code == 200:
+                return {
+                    "success": True,
+                    "appointment": orjson.loads(response.content)
+                }
+            else:
+                return {
+                    "success": False,
+                    "error": "Appointment not found"
+                }
         except Exception as e:
             return {
                 "success": False,
@@ -338,10 +354,9 @@ class BookingTool:
         confirmation_code = booking_result.get("confirmation_code", "N/A")
         
         # Format date nicely
-        from datetime import datetime
         date_str = details.get("date", "")
         try:
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
+            date_obj = datetime.fromisoformat(date_str)
             formatted_date = date_obj.strftime("%A, %B %d, %Y")
         except ValueError:
             formatted_date = date_str
@@ -0,0 +1,18 @@
+"""
+Shared HTTP client settings for the Calendly tools.
+Each tool keeps one pooled client so keep-alive connections are reused across requests.
+"""
+
+import httpx
+
+
+HTTP_MAX_CONNECTIONS = 32
+HTTP_TIMEOUT_SECONDS = 5.0
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """Create a pooled async HTTP client."""
+    return httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS),
+        timeout=HTTP_TIMEOUT_SECONDS
+    )
@@ -7,6 +7,7 @@ import asyncio
 from datetime import datetime, timedelta
 from pathlib import Path
 import sys
+import time
 
 # Add backend to path
 backend_path = Path(__file__).parent.parent / "backend"
@@ -16,6 +17,7 @@ from models.schemas import (
     AppointmentType,
     APPOINTMENT_DURATIONS,
     ConversationPhase,
+    ConversationState,
 )
 from tools.availability_tool import (
     parse_date_reference,
@@ -23,6 +25,24 @@ from tools.availability_tool import (
     AvailabilityTool
 )
 from tools.booking_tool import BookingTool
+from rag.semantic_cache import SemanticCache
+from agent.extractors import extract_contact_info, extract_name
+from agent.intent_classifier import EmbeddingIntentClassifier
+from agent.memory import ConversationMemory
+from agent.session_store import pack_state, unpack_state
+from agent.scheduling_agent import SchedulingAgent, _infer_appointment_type
+from agent.prompts import (
+    SYSTEM_PROMPT,
+    SYSTEM_PROMPT_STATIC,
+    CLINIC_FACTS,
+    SLOT_RECOMMENDATION_PROMPT,
+    INTENT_CLASSIFICATION_PROMPT,
+    GREETINGS,
+    greeting,
+    system_prompt_blocks,
+    render_slot_recommendation,
+    truncate_to_tokens,
+)
 
 
 class TestDateParsing:
@@ -92,6 +112,11 @@ class TestAppointmentTypes:
         assert AppointmentType.FOLLOW_UP.value == "followup"
         assert AppointmentType.PHYSICAL_EXAM.value == "physical"
         assert AppointmentType.SPECIALIST_CONSULTATION.value == "specialist"
+    
+    def test_infer_type_from_reason(self):
+        assert _infer_appointment_type("Annual check-up") == AppointmentType.PHYSICAL_EXAM
+        assert _infer_appointment_type("Detailed follow up on results") == AppointmentType.FOLLOW_UP
+        assert _infer_appointment_type("Persistent headaches") == AppointmentType.GENERAL_CONSULTATION
 
 
 class TestPatientValidation:
@@ -155,6 +180,15 @@ class TestConversationPhases:
         ]
         for phase in phases:
             assert phase is not None
+    
+    def test_missing_contact_fields_tracked(self):
+        state = ConversationState(session_id="test")
+        state.set_patient_field("email", "john@example.com")
+        state.set_patient_field("phone", "555-123-4567")
+        assert state.missing_contact_fields == {"name"}
+        state.set_patient_field("name", "John Smith")
+        assert not state.missing_contact_fields
+        assert ConversationState(session_id="other").missing_contact_fields == {"name", "phone", "email"}
 
 
 # Async tests for API integration
@@ -186,6 +220,53 @@ class TestAvailabilityTool:
         filtered = tool.get_slots_for_time_preference(slots, "afternoon")
         assert len(filtered) == 2
         assert all(12 <= int(s["start_time"].split(":")[0]) < 17 for s in filtered)
+    
+    async def test_available_slots_cached_until_invalidated(self):
+        tool = AvailabilityTool()
+        calls = []
+        
+        async def fetch(date, appointment_type):
+            calls.append(date)
+            return {"success": True, "available_slots": []}
+        
+        tool._fetch_available_slots = fetch
+        await tool.get_available_slots("2030-01-15", "consultation")
+        await tool.get_available_slots("2030-01-15", "consultation")
+        assert len(calls) == 1
+        
+        tool.invalidate("2030-01-15")
+        await tool.get_available_slots("2030-01-15", "consultation")
+        assert len(calls) == 2
+    
+    async def test_invalidate_drops_every_type_for_the_date(self):
+        tool = AvailabilityTool()
+        calls = []
+        
+        async def fetch(date, appointment_type):
+            calls.append((date, appointment_type))
+            return {"success": True, "available_slots": []}
+        
+        tool._fetch_available_slots = fetch
+        for key in [("2030-01-15", "consultation"), ("2030-01-15", "physical"), ("2030-01-16", "physical")]:
+            await tool.get_available_slots(*key)
+        
+        tool.invalidate("2030-01-15")
+        for key in [("2030-01-15", "consultation"), ("2030-01-15", "physical"), ("2030-01-16", "physical")]:
+            await tool.get_available_slots(*key)
+        assert calls[3:] == [("2030-01-15", "consultation"), ("2030-01-15", "physical")]
+    
+    async def test_concurrent_slot_requests_share_one_fetch(self):
+        tool = AvailabilityTool()
+        calls = []
+        
+        async def fetch(date, appointment_type):
+            calls.append(date)
+            await asyncio.sleep(0.01)
+            return {"success": True, "available_slots": []}
+        
+        tool._fetch_available_slots = fetch
+        await asyncio.gather(*[tool.get_available_slots("2030-01-15") for _ in range(5)])
+        assert len(calls) == 1
 
 
 class TestConfirmationMessage:
@@ -228,6 +309,319 @@ class TestConfirmationMessage:
         assert "apologize" in message.lower() or "sorry" in message.lower() or "wasn't able" in message.lower()
 
 
+class TestPrompts:
+    """Tests for prompt construction helpers."""
+    
+    def test_system_prompt_blocks_anthropic(self):
+        blocks = system_prompt_blocks("anthropic")
+        assert blocks[0]["text"] == SYSTEM_PROMPT_STATIC
+        assert blocks[0]["cache_control"] == {"type": "ephemeral"}
+        assert blocks[1]["text"] == CLINIC_FACTS
+        assert "cache_control" not in blocks[1]
+    
+    def test_system_prompt_blocks_gemini(self):
+        assert system_prompt_blocks("gemini") == SYSTEM_PROMPT
+    
+    def test_compiled_renderer_matches_format(self):
+        fields = {
+            "date": "Friday, October 16",
+            "time_preference": "morning",
+            "k": 2,
+            "formatted_slots": "9:00 AM, 9:30 AM",
+        }
+        assert render_slot_recommendation(**fields) == SLOT_RECOMMENDATION_PROMPT.format(**fields)
+    
+    def test_intent_classification_prompt_formats(self):
+        prompt = INTENT_CLASSIFICATION_PROMPT.format(
+            message="I need to book a checkup",
+            current_phase="greeting"
+        )
+        assert 'Message: "I need to book a checkup"' in prompt
+    
+    def test_truncate_to_tokens(self):
+        assert truncate_to_tokens("short text", 10) == "short text"
+        capped = truncate_to_tokens("word " * 1000, 16)
+        assert len(capped) <= 64 and not capped.endswith(" ")
+    
+    def test_greeting_is_prewritten(self):
+        assert greeting() in GREETINGS
+
+
+class TestSemanticCache:
+    """Tests for the embedding-keyed response cache."""
+    
+    def test_hit_on_similar_embedding(self):
+        cache = SemanticCache(threshold=0.9)
+        cache.put([1.0, 0.0, 0.0], "We're open 8AM-6PM.")
+        assert cache.get([0.99, 0.05, 0.0]) == "We're open 8AM-6PM."
+        assert cache.get([0.0, 1.0, 0.0]) is None
+    
+    def test_evicts_least_recently_used(self):
+        cache = SemanticCache(threshold=0.9, capacity=2)
+        cache.put([1.0, 0.0, 0.0], "a")
+        cache.put([0.0, 1.0, 0.0], "b")
+        cache.get([1.0, 0.0, 0.0])
+        cache.put([0.0, 0.0, 1.0], "c")
+        assert len(cache) == 2
+        assert cache.get([0.0, 1.0, 0.0]) is None
+        assert cache.get([1.0, 0.0, 0.0]) == "a"
+
+
+class TestEmbeddingIntentClassifier:
+    """Tests for the local fallback intent classifier."""
+    
+    @staticmethod
+    def _embed(texts):
+        # Toy embedding: counts of a few indicative words
+        words = ["book", "cancel", "insurance"]
+        return [[text.lower().count(w) + 0.01 for w in words] for text in texts]
+    
+    def test_classifies_above_threshold(self):
+        classifier = EmbeddingIntentClassifier(
+            self._embed,
+            examples={"SCHEDULE": ["book a visit"], "CANCEL": ["cancel it"]},
+            threshold=0.9
+        )
+        assert classifier.classify("please book me in")[0] == "SCHEDULE"
+        assert classifier.classify("do you take insurance")[0] is None
+    
+    @pytest.mark.asyncio
+    async def test_fallback_does_not_block_event_loop(self):
+        class SlowClassifier:
+            def classify(self, message):
+                time.sleep(0.2)
+                return "SCHEDULE", 0.9
+        
+        agent = SchedulingAgent()
+        agent.intent_classifier = SlowClassifier()
+        ticks = 0
+        
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+        
+        tick_task = asyncio.create_task(ticker())
+        intent, _entities = await agent.classify_intent("blorp blorp blorp", ConversationPhase.GREETING)
+        tick_task.cancel()
+        
+        # Other tasks kept running while the message was classified
+        assert intent.value == "SCHEDULE"
+        assert ticks > 5
+    
+    @pytest.mark.asyncio
+    async def test_fallback_skips_short_messages_and_never_confirms(self):
+        calls = []
+        
+        class ConfirmingClassifier:
+            def classify(self, message):
+                calls.append(message)
+                return "CONFIRM", 0.99
+        
+        agent = SchedulingAgent()
+        agent.intent_classifier = ConfirmingClassifier()
+        
+        intent, _entities = await agent.classify_intent("blorp", ConversationPhase.GREETING)
+        assert intent.value == "OTHER" and calls == []
+        
+        intent, _entities = await agent.classify_intent("blorp blorp blorp", ConversationPhase.GREETING)
+        assert intent.value == "OTHER" and calls == ["blorp blorp blorp"]
+
+
+class TestSessionStore:
+    """Tests for serializing sessions for the shared store."""
+    
+    def test_state_round_trips_through_msgpack(self):
+        pytest.importorskip("msgspec")
+        state = ConversationState(session_id="abc", phase=ConversationPhase.COLLECTING_INFO)
+        state.set_patient_field("name", "Jane Doe")
+        state.messages.append(("user", "hi", datetime.now()))
+        
+        restored = unpack_state(pack_state(state))
+        
+        assert restored.phase is ConversationPhase.COLLECTING_INFO
+        assert restored.patient_info == {"name": "Jane Doe"}
+        assert restored.missing_contact_fields == {"phone", "email"}
+        assert list(restored.messages) == list(state.messages)
+        assert restored.messages.maxlen == state.messages.maxlen
+    
+    def test_stored_fields_match_conversation_state(self):
+        pytest.importorskip("msgspec")
+        from agent.session_store import StoredState
+        
+        assert set(StoredState.__struct_fields__) == set(ConversationState.model_fields)
+
+
+@pytest.mark.asyncio
+class TestStreaming:
+    """Tests for streaming replies as they are generated."""
+    
+    class _FakeChat:
+        history = []
+        
+        async def send_message_async(self, prompt, generation_config=None, stream=False):
+            async def chunks():
+                for text in ("Sure, ", "what kind ", "of visit?"):
+                    yield type("Chunk", (), {"text": text})()
+            return chunks()
+    
+    class _FakeModel:
+        def start_chat(self, history):
+            return TestStreaming._FakeChat()
+    
+    async def test_streams_gemini_chunks_then_done(self):
+        agent = SchedulingAgent()
+        agent.llm_model = self._FakeModel()
+        events = [e async for e in agent.process_message_stream("I want to book an appointment")]
+        
+        assert [e["text"] for e in events[:-1]] == ["Sure, ", "what kind ", "of visit?"]
+        assert events[-1]["type"] == "done"
+        assert events[-1]["message"] == "Sure, what kind of visit?"
+    
+    async def test_canned_reply_only_sends_done(self):
+        agent = SchedulingAgent()
+        events = [e async for e in agent.process_message_stream("hello")]
+        
+        assert len(events) == 1
+        assert events[0]["type"] == "done" and events[0]["message"]
+
+
+@pytest.mark.asyncio
+class TestStaticResponseCache:
+    """Tests for reusing replies to static Gemini contexts."""
+    
+    async def test_same_context_and_message_calls_gemini_once(self):
+        calls = []
+        
+        class FakeChat:
+            history = []
+            
+            async def send_message_async(self, prompt, stream=False):
+                raise AssertionError("static contexts must not use the session's history")
+        
+        class FakeModel:
+            def start_chat(self, history):
+                return FakeChat()
+            
+            async def generate_content_async(self, prompt, stream=False):
+                calls.append(prompt)
+                return type("Response", (), {"text": "What would you like to confirm?"})()
+        
+        agent = SchedulingAgent()
+        agent.llm_model = FakeModel()
+        
+        for session_id in ("a", "b"):
+            reply = await agent.chat_with_gemini("Yes ", session_id, "ctx", context_id="confirm_unclear")
+            assert reply == "What would you like to confirm?"
+        assert len(calls) == 1
+        # The reply still becomes part of each session's history
+        for session_id in ("a", "b"):
+            assert [turn["role"] for turn in agent.chat_sessions[session_id].history] == ["user", "model"]
+
+
+@pytest.mark.asyncio
+class TestConfirmationDraft:
+    """Tests for drafting the booking-link reply while booking."""
+    
+    @staticmethod
+    def _agent(booking_result):
+        class FakeModel:
+            def start_chat(self, history):
+                return type("Chat", (), {"history": []})()
+            
+            async def generate_content_async(self, prompt, stream=False):
+                return type("Response", (), {"text": "Click [BOOKING_LINK] to finish."})()
+        
+        class FakeBookingTool:
+            use_real_calendly = True
+            
+            async def book_appointment(self, **kwargs):
+                return booking_result
+        
+        agent = SchedulingAgent()
+        agent.llm_model = FakeModel()
+        agent.booking_tool = FakeBookingTool()
+        return agent
+    
+    async def test_link_reply_recorded_with_real_url(self):
+        agent = self._agent({
+            "success": True,
+            "status": "pending_user_action",
+            "scheduling_url": "https://calendly.example/abc",
+        })
+        state = ConversationState(session_id="s", phase=ConversationPhase.CONFIRMATION)
+        
+        reply = await agent._handle_confirmation(state)
+        
+        assert reply == "Click https://calendly.example/abc to finish."
+        assert agent.chat_sessions["s"].history[-1]["parts"] == [reply]
+    
+    async def test_failed_booking_leaves_no_draft_in_history(self):
+        agent = self._agent({"success": False, "error": "slot taken"})
+        agent.chat_with_gemini = lambda message, session_id, context: asyncio.sleep(0, "Sorry")
+        state = ConversationState(session_id="s", phase=ConversationPhase.CONFIRMATION)
+        
+        assert await agent._handle_confirmation(state) == "Sorry"
+        assert "s" not in agent.chat_sessions
+
+
+class TestConversationMemory:
+    """Tests for recalling trimmed conversation turns."""
+    
+    def test_recalls_relevant_turns_per_session(self):
+        memory = ConversationMemory(TestEmbeddingIntentClassifier._embed)
+        memory.add("s1", ["user: I want to book a visit", "user: what insurance do you take"])
+        assert memory.recall("s1", [0.01, 0.01, 1.0], k=1) == ["user: what insurance do you take"]
+        assert memory.recall("s2", [0.01, 0.01, 1.0]) == []
+        memory.drop("s1")
+        assert not memory.has("s1")
+
+
+class TestExtractors:
+    """Tests for deterministic contact extraction."""
+    
+    def test_all_fields_in_one_message(self):
+        info = extract_contact_info("John Doe, (555) 123-4567, john.doe@example.com")
+        assert info == {
+            "name": "John Doe",
+            "phone": "(555) 123-4567",
+            "email": "john.doe@example.com",
+        }
+    
+    def test_digits_in_email_not_read_as_phone(self):
+        assert extract_contact_info("jane5551234567@example.com") == {
+            "email": "jane5551234567@example.com"
+        }
+    
+    def test_name_not_taken_from_sentences(self):
+        assert extract_name("my phone is 555-123-4567") is None
+        assert extract_name("My name is Jane Smith") == "Jane Smith"
+        assert extract_name("Jane Smith") == "Jane Smith"
+    
+    def test_introduced_name_stops_before_other_fields(self):
+        assert extract_contact_info("My name is John Smith and my phone is 555-123-4567") == {
+            "name": "John Smith",
+            "phone": "555-123-4567",
+        }
+        assert extract_contact_info("This is Jane Doe jane@doe.com") == {
+            "name": "Jane Doe",
+            "email": "jane@doe.com",
+        }
+    
+    def test_introductions_without_a_name(self):
+        assert extract_name("I am not sure") is None
+        assert extract_name("I am available tomorrow") is None
+    
+    def test_long_digit_runs_not_read_as_phone(self):
+        assert "phone" not in extract_contact_info("order " + "1" * 40)
+    
+    def test_dates_and_short_numbers_not_read_as_phone(self):
+        assert "phone" not in extract_contact_info("I'd like 2024-10-17 please")
+        assert "phone" not in extract_contact_info("ref 12-34-56-78")
+        assert extract_contact_info("2024-10-17, 555-123-4567")["phone"] == "555-123-4567"
+
+
 # Example conversation tests
 class TestConversationExamples:
     """Tests based on the specification examples."""